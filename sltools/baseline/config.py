@@ -13,6 +13,10 @@ text_wrap_width = 80
 
 # For flask server
 file_changes_msg_queue = queue.Queue()
+# Bursts of file events (editor saves, git checkouts) are coalesced into one batch (seconds)
+file_changes_debounce_window = 0.3
+# Batch is flushed at least that often, even if the burst lasts longer (seconds)
+file_changes_max_delay = 3
 
 
 class DefaultArgs(object):
@@ -1,6 +1,8 @@
 import configparser
 import os
 
+TEXT_RULE_SECTION_PREFIX = 'rule:'
+
 
 class GeneralConfig:
     def __init__(self, loglevel=None, language=None, show_stacktrace=None):
@@ -9,9 +11,17 @@ class GeneralConfig:
         self.show_stacktrace = show_stacktrace
 
 
+class XmlConfig:
+    def __init__(self, include_roots=None):
+        self.include_roots = include_roots
+
+
 class FileConfig:
     def __init__(self):
         self.general = GeneralConfig()
+        self.xml = XmlConfig()
+        # Rule name -> options of user defined text rule (from '[rule:<name>]' sections)
+        self.text_rules = {}
 
 
 class ConfigFileManager:
@@ -43,6 +53,12 @@ class ConfigFileManager:
         self.file_config.general.loglevel = self.config.get('general', 'loglevel', fallback='info')
         self.file_config.general.language = self.config.get('general', 'language', fallback='en')
         self.file_config.general.show_stacktrace = self.config.getboolean('general', 'show_stacktrace', fallback=False)
+        self.file_config.xml.include_roots = self.config.get('xml', 'include_roots', fallback='../../gamedata/configs')
+        # Patterns are full of '%' (e.g. '%c[red]'), so rule options are read raw
+        self.file_config.text_rules = {
+            section[len(TEXT_RULE_SECTION_PREFIX):]: {key: self.config.get(section, key, raw=True) for key in self.config[section]}
+            for section in self.config.sections() if section.startswith(TEXT_RULE_SECTION_PREFIX)
+        }
 
     def update_config(self, section, key, value):
         """Update a specific configuration setting."""
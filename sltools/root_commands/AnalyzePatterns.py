@@ -1,18 +1,23 @@
-import json
+import os
 import subprocess
 import time
+from collections import Counter
 from datetime import datetime
 
-from rich import pretty
+from rich import pretty, get_console
 
 from sltools.baseline.command_baseline import AbstractCommand
 from sltools.baseline.common import get_xml_files_and_log
 from sltools.log_config_loader import log
 from sltools.utils.colorize import cf_green, cf_red, cf_yellow, cf_cyan, rich_guard, cf_blue, cf_magenta
-from sltools.utils.file_utils import read_xml
+from sltools.utils.file_utils import read_xml, iter_json_object_items, read_json_member, save_xml
 from sltools.utils.lang_utils import trn
-from sltools.utils.plain_text_utils import analyze_patterns_in_text, check_placeholders
-from sltools.utils.xml_utils import parse_xml_root
+from sltools.utils.misc import create_table
+from sltools.utils.plain_text_utils import analyze_patterns_in_text, check_placeholders, LineIndex, \
+    scan_placeholders, fix_placeholders, check_text_rules, get_file_text_rules, SEVERITY_WARNING, SEVERITY_INFO
+from sltools.utils.report_utils import NameTable, CompactReportWriter, CompactReportReader, is_compact_report, \
+    COMPRESSIONS
+from sltools.utils.xml_utils import iter_strings, parse_xml_root, format_xml_root
 
 # JUNK
 # Dictionary keys
@@ -26,19 +31,94 @@ STRING_ID_KEY = "string_id"
 NEWLINE_PATTERN = "\\n"
 STRING_PATTERNS = "patterns"
 PATTERN_ERRORS_KEY = "errors"
+COMPARISON_KEY = "comparison"
+CONVERTED_REPORT_KEY = "converted_report"
+FIX_REPORT_KEY = "fix_report"
+REPORT_EXTENSION = ".sltap"
 
 failed_files = {}
 CURRENT_FILE_ISSUES = []
 
 
-def serialize_analysis(analysis, file_path):
-    with open(file_path, 'w') as file:
-        json.dump(analysis, file, indent=4)
+# Compact report
+PATTERNS_SECTION = "patterns"
+ERRORS_SECTION = "errors"
+
+
+def encode_file_analysis(file_analysis, names: NameTable):
+    """
+    Returns:
+        tuple: Patterns and errors of strings, so they can be stored (and loaded) separately.
+        File-level patterns and errors are aggregated from strings, so they aren't stored.
+    """
+    encoded_patterns = []
+    encoded_errors = []
+    for string_id, string_analysis in file_analysis[PER_STRING_KEY].items():
+        encoded_patterns.append([string_id, [[names.intern(pattern_type), names.intern(pattern), cnt]
+                                             for pattern_type, patterns_stats in string_analysis[STRING_PATTERNS].items()
+                                             for pattern, cnt in patterns_stats.items()]])
+        encoded_errors.append(string_analysis[PATTERN_ERRORS_KEY])
+    return encoded_patterns, encoded_errors
+
+
+def decode_file_analysis(file_name, encoded_patterns, encoded_errors, names: NameTable):
+    """Errors may be None, if they weren't loaded. Then the analysis contains patterns only"""
+    name_list = names.names
+    per_string_analysis = {}
+    for i, (string_id, string_patterns) in enumerate(encoded_patterns):
+        patterns = {}
+        for pattern_type, pattern, cnt in string_patterns:
+            patterns.setdefault(name_list[pattern_type], {})[name_list[pattern]] = cnt
+        per_string_analysis[string_id] = {
+            STRING_PATTERNS: patterns,
+            PATTERN_ERRORS_KEY: encoded_errors[i] if encoded_errors is not None else []
+        }
+
+    file_patterns_summary, file_patterns_errors = aggregate_data(per_string_analysis)
+    return {
+        FILENAME_KEY: file_name,
+        PATTERNS_KEY: file_patterns_summary,
+        PATTERN_ERRORS_KEY: file_patterns_errors,
+        PER_STRING_KEY: per_string_analysis
+    }
 
 
-def deserialize_analysis(file_path):
-    with open(file_path, 'r') as file:
-        return json.load(file)
+def save_compact_analysis(file_analyses, meta_data, file_path, compression):
+    """
+    Args:
+        file_analyses: Iterable of (file_name, file_analysis).
+    """
+    with CompactReportWriter(file_path, compression, meta_data) as writer:
+        for file_name, file_analysis in file_analyses:
+            encoded_patterns, encoded_errors = encode_file_analysis(file_analysis, writer.names)
+            writer.add_record(PATTERNS_SECTION, file_name, encoded_patterns)
+            writer.add_record(ERRORS_SECTION, file_name, encoded_errors)
+
+
+def iter_saved_analysis_files(file_path, with_errors=True):
+    """
+    Yields (file_name, loader) for each file of the saved report (compact or JSON one).
+    Compact report decompresses and decodes the file analysis only when its loader is called
+    (and skips pattern errors entirely if they aren't needed).
+    """
+    def load_compact(reader, name):
+        encoded_errors = reader.load_record(ERRORS_SECTION, name) if with_errors else None
+        return decode_file_analysis(name, reader.load_record(PATTERNS_SECTION, name), encoded_errors, reader.names)
+
+    if is_compact_report(file_path):
+        with CompactReportReader(file_path) as reader:
+            for file_name in list(reader.record_names(PATTERNS_SECTION)):
+                yield file_name, lambda name=file_name: load_compact(reader, name)
+    else:
+        for file_name, file_analysis in iter_json_object_items(file_path, PER_FILE_KEY):
+            yield file_name, lambda analysis=file_analysis: analysis
+
+
+def convert_json_report(json_file_path, compression):
+    compact_file_path = os.path.splitext(json_file_path)[0] + REPORT_EXTENSION
+    meta_data = read_json_member(json_file_path, META_DATA_KEY)
+    save_compact_analysis(iter_json_object_items(json_file_path, PER_FILE_KEY), meta_data, compact_file_path, compression)
+    return compact_file_path
 
 
 def build_file_name():
@@ -49,10 +129,10 @@ def build_file_name():
         commit_name = subprocess.check_output(['git', 'log', '-1', '--pretty=format:%s'],
                                               text=True).strip().replace(' ', '_').replace('/', '-').replace(':', '-')
         commit_hash = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
-        file_name = 'pattern-analysis_br-%s_cmd-%s_hash-%s_time-%d.txt' % (branch, commit_name, commit_hash, timestamp)
+        file_name = 'pattern-analysis_br-%s_cmd-%s_hash-%s_time-%d' % (branch, commit_name, commit_hash, timestamp)
     except subprocess.CalledProcessError:
-        file_name = 'pattern-analysis_%d.txt' % timestamp
-    return file_name
+        file_name = 'pattern-analysis_%d' % timestamp
+    return file_name + REPORT_EXTENSION
 
 
 def aggregate_data(detailed_analysis):
@@ -112,78 +192,94 @@ def add_meta_data(current_analysis):
     return current_analysis
 
 
-def compare_analyses(previous_analysis, current_analysis, PATTERNS):
+def count_patterns(patterns_report):
+    # Pattern type -> pattern -> count  =>  pattern -> count. Same pattern may be counted by several types
+    counts = Counter()
+    for patterns_stats in patterns_report.values():
+        counts.update(patterns_stats)
+    return counts
+
+
+def compare_pattern_counts(previous_counts, current_counts):
+    mismatches = {}
+    for pattern in {**previous_counts, **current_counts}:
+        prev_count = previous_counts.get(pattern, 0)
+        curr_count = current_counts.get(pattern, 0)
+        if prev_count != curr_count:
+            mismatches[pattern] = (prev_count, curr_count, curr_count - prev_count)
+    return mismatches
+
+
+def compare_analyses(previous_analysis_path, current_analysis):
+    """
+    Compares the saved analysis with the current one. The saved one is streamed file by file
+    and joined with the current one by file name and string id.
+
+    Returns:
+        dict: Missing and extra files, total pattern counts and mismatches per file (only files with mismatches).
+    """
+    current_files = current_analysis[PER_FILE_KEY]
+    seen_files = set()
+    missing_files = []
     mismatched_files = []
     total_patterns_prev = {}
-    for pattern in PATTERNS:
-        total_patterns_prev[pattern] = 0
-
-    total_patterns_curr = dict(total_patterns_prev)  # Deep copy
-    total_patterns_change = dict(total_patterns_prev)  # Deep copy
-
-    # Get all file names from both the previous and current analyses
-    previous_file_names = set(file[FILENAME_KEY] for file in previous_analysis[PER_FILE_KEY])
-    current_file_names = set(file[FILENAME_KEY] for file in current_analysis[PER_FILE_KEY])
-
-    # Check for missing or extra files in the current analysis
-    missing_files = previous_file_names - current_file_names
-    extra_files = current_file_names - previous_file_names
-    if missing_files:
-        log.always(trn("Missing files in current analysis: %s") % ', '.join(missing_files))
-    if extra_files:
-        log.always(trn("Extra files in current analysis: %s") % ', '.join(extra_files))
-
-    # Only compare files that are present in both analyses
-    common_files = previous_file_names.intersection(current_file_names)
-
-    for file_name in common_files:
-        # Fetch file analysis data by file name
-        previous_file_data = next(file for file in previous_analysis[PER_FILE_KEY] if file[FILENAME_KEY] == file_name)
-        current_file_data = next(file for file in current_analysis[PER_FILE_KEY] if file[FILENAME_KEY] == file_name)
-
-        file_mismatched_patterns = {}
-        for pattern in PATTERNS:
-            prev_count = previous_file_data[PATTERNS_KEY].get(pattern, 0)
-            total_patterns_prev[pattern] += prev_count
-
-            curr_count = current_file_data[PATTERNS_KEY].get(pattern, 0)
-            total_patterns_curr[pattern] += curr_count
-            if prev_count != curr_count:
-                change = curr_count - prev_count
-                total_patterns_change[pattern] += change
-                file_mismatched_patterns[pattern] = (prev_count, curr_count, change)
-
-        per_text_tag_mismatched_patterns = {}
-        # Ensure that we are comparing the same string tags within the file
-        common_string_ids = set(previous_file_data[PER_STRING_KEY].keys()).intersection(
-            set(current_file_data[PER_STRING_KEY].keys())
-        )
-        for string_id in common_string_ids:
-            previous_tag_patterns = previous_file_data[PER_STRING_KEY][string_id]
-            current_tag_patterns = current_file_data[PER_STRING_KEY][string_id]
-            for pattern in PATTERNS:
-                prev_count = previous_tag_patterns.get(pattern, 0)
-                curr_count = current_tag_patterns.get(pattern, 0)
-                if prev_count != curr_count:
-                    change = curr_count - prev_count
-                    per_text_tag_mismatched_patterns.setdefault(string_id, {})[pattern] = (
-                        prev_count, curr_count, change)
-
-        if file_mismatched_patterns or per_text_tag_mismatched_patterns:
-            mismatched_files.append((file_name, file_mismatched_patterns, per_text_tag_mismatched_patterns))
+    total_patterns_curr = {}
+
+    # Only patterns are compared
+    for file_name, load_previous_file_data in iter_saved_analysis_files(previous_analysis_path, with_errors=False):
+        current_file_data = current_files.get(file_name)
+        if current_file_data is None:
+            missing_files.append(file_name)
+            continue
+        seen_files.add(file_name)
+        previous_file_data = load_previous_file_data()
+
+        previous_counts = count_patterns(previous_file_data[PATTERNS_KEY])
+        current_counts = count_patterns(current_file_data[PATTERNS_KEY])
+        for pattern, cnt in previous_counts.items():
+            total_patterns_prev[pattern] = total_patterns_prev.get(pattern, 0) + cnt
+        for pattern, cnt in current_counts.items():
+            total_patterns_curr[pattern] = total_patterns_curr.get(pattern, 0) + cnt
+        file_mismatched_patterns = compare_pattern_counts(previous_counts, current_counts)
+
+        per_string_mismatched_patterns = {}
+        previous_strings = previous_file_data[PER_STRING_KEY]
+        current_strings = current_file_data[PER_STRING_KEY]
+        for string_id, previous_string_data in previous_strings.items():
+            current_string_data = current_strings.get(string_id)
+            if current_string_data is None:
+                continue
+            string_mismatches = compare_pattern_counts(count_patterns(previous_string_data[STRING_PATTERNS]),
+                                                       count_patterns(current_string_data[STRING_PATTERNS]))
+            if string_mismatches:
+                per_string_mismatched_patterns[string_id] = string_mismatches
+
+        if file_mismatched_patterns or per_string_mismatched_patterns:
+            mismatched_files.append((file_name, file_mismatched_patterns, per_string_mismatched_patterns))
+
+    return {
+        "missing_files": missing_files,
+        "extra_files": [file_name for file_name in current_files if file_name not in seen_files],
+        "total_mismatches": compare_pattern_counts(total_patterns_prev, total_patterns_curr),
+        "mismatched_files": mismatched_files
+    }
+
+
+def display_comparison(comparison):
+    if comparison["missing_files"]:
+        log.always(trn("Missing files in current analysis: %s") % ', '.join(comparison["missing_files"]))
+    if comparison["extra_files"]:
+        log.always(trn("Extra files in current analysis: %s") % ', '.join(comparison["extra_files"]))
 
+    mismatched_files = comparison["mismatched_files"]
     if mismatched_files:
         log.always(cf_yellow("#" * 80))
         log.always(cf_yellow(trn("###### Mismatch in reports detected! ######")))
         log.always(cf_yellow("#" * 80))
         log.always(cf_blue("#" * 10 + trn(" Total missmatch: ") + "#" * 10))
-        for pattern in PATTERNS:
-            prev_count = total_patterns_prev[pattern]
-            curr_count = total_patterns_curr[pattern]
-            change = total_patterns_change[pattern]
-            if change != 0:
-                log.always(cf_blue(trn("Pattern: '%s', %d %s than before. Before %d after %d")
-                                   % (pattern, abs(change), get_action(change), prev_count, curr_count)))
+        for pattern, (prev_count, curr_count, change) in comparison["total_mismatches"].items():
+            log.always(cf_blue(trn("Pattern: '%s', %d %s than before. Before %d after %d")
+                               % (pattern, abs(change), get_action(change), prev_count, curr_count)))
 
         log.always(cf_magenta("\t" + "#" * 10 + trn(" Mismatched files: ") + "#" * 10))
         for file, file_mismatches, text_tag_mismatches in mismatched_files:
@@ -206,6 +302,61 @@ def compare_analyses(previous_analysis, current_analysis, PATTERNS):
         log.always(cf_green("#" * 30))
 
 
+def fix_file_patterns(file_path):
+    """
+    Fixes pattern errors of all strings with a single parse and serialization of the file.
+
+    Returns:
+        list: (string id, error types, placeholder before, placeholder after) of applied fixes.
+    """
+    root = parse_xml_root(read_xml(file_path))
+    rules = get_file_text_rules(file_path)
+
+    fixes = []
+    for string_elem in root:
+        for text_elem in string_elem:
+            if text_elem.tag != 'text' or not text_elem.text:
+                continue
+            fixed_text, applied = fix_placeholders(text_elem.text, rules=rules)
+            if not applied:
+                continue
+            text_elem.text = fixed_text
+            string_id = string_elem.attrib.get("id")
+            for error_types, before, after in applied:
+                log.info(trn("Fixed '%s' -> '%s' in '%s'") % (rich_guard(before), rich_guard(after), cf_cyan(string_id)))
+                fixes.append((string_id, error_types, before, after))
+
+    if fixes:
+        save_xml(file_path, format_xml_root(root))
+    return fixes
+
+
+def display_fix_report(fix_report):
+    if len(fix_report) == 0:
+        log.always(cf_green(trn("No fixable pattern errors detected")))
+        return
+
+    for file_path, fixes in fix_report.items():
+        log.always(trn("[cyan]In file:[/cyan] %s: %s fixes") % (cf_yellow(file_path), cf_green(len(fixes))))
+        table = create_table([trn("String id"), trn("Error"), trn("Before"), trn("After")])
+        for string_id, error_types, before, after in fixes:
+            # Quoted, so whitespace fixes are visible too
+            table.add_row(string_id, "\n".join(error_types), "'%s'" % rich_guard(before), "'%s'" % rich_guard(after))
+        get_console().print(table)
+
+    log.always(trn("Total fixes: %s in %s files") % (cf_green(sum(len(fixes) for fixes in fix_report.values())),
+                                                     cf_green(len(fix_report))))
+
+
+def format_severity(severity):
+    # Built-in pattern errors have no severity
+    if severity == SEVERITY_WARNING:
+        return cf_yellow(trn("Warning: %s"))
+    if severity == SEVERITY_INFO:
+        return cf_cyan(trn("Info: %s"))
+    return cf_red(trn("Error: %s"))
+
+
 def get_action(change):
     return trn('more') if change > 0 else trn('less')
 
@@ -225,26 +376,42 @@ class AnalyzePatterns(AbstractCommand):
     def _setup_parser_args(self, parser):
         parser.add_argument('paths', nargs='*', help=trn('Paths to files or directories'))
         parser.add_argument('--save', action='store_true', default=False,
-                            help=trn('Save detailed report as JSON file (for future comparison)'))
+                            help=trn('Save detailed report as compact file (for future comparison)'))
+        parser.add_argument('--compression', choices=list(COMPRESSIONS), default='gzip',
+                            help=trn('Compression of the saved report'))
+        parser.add_argument('--convert-report', metavar='JSON_REPORT',
+                            help=trn('Convert report saved in old JSON format to compact one'))
+        parser.add_argument('--compare', metavar='SAVED_REPORT',
+                            help=trn('Compare with the report saved earlier with --save and show only mismatches'))
+        parser.add_argument('--fix', action='store_true', default=False,
+                            help=trn('Fix pattern errors in place and show what was fixed in each file'))
+        self._add_git_override_arguments(parser)
 
     # Execution
     ###########
     def _process_file(self, file_path, per_file_results: dict, args):
-        xml_string = read_xml(file_path)
-        root = parse_xml_root(xml_string)
+        if args.fix:
+            fixes = fix_file_patterns(file_path)
+            if fixes:
+                per_file_results[file_path] = fixes
+            return
+
+        # Plain text is still needed to locate errors in the file, but the tree is never built
+        line_index = LineIndex(read_xml(file_path))
+        # User defined text rules are checked by the same scan as placeholders
+        rules = get_file_text_rules(file_path)
 
         per_string_analysis = {}
-        for string_tag in root.findall('.//string'):
+        for string_id, text_content, line in iter_strings(file_path):
             string_analysis = {
                 STRING_PATTERNS: None,
                 PATTERN_ERRORS_KEY: None
             }
-            string_id = string_tag.get('id')
-            text_tag = string_tag.find('text')
-            if text_tag is not None:
-                text_content = text_tag.text if text_tag.text else ''
-                string_analysis[STRING_PATTERNS] = analyze_patterns_in_text(text_content)
-                string_analysis[PATTERN_ERRORS_KEY] = check_placeholders(text_content, xml_string)
+            if text_content is not None:
+                matches = scan_placeholders(text_content, rules)
+                string_analysis[STRING_PATTERNS] = analyze_patterns_in_text(text_content, matches)
+                string_analysis[PATTERN_ERRORS_KEY] = (check_placeholders(text_content, line_index, line, matches)
+                                                       + check_text_rules(text_content, line_index, line, matches, rules))
                 per_string_analysis[string_id] = string_analysis
 
         file_patterns_summary, file_patterns_errors = aggregate_data(per_string_analysis)
@@ -257,6 +424,16 @@ class AnalyzePatterns(AbstractCommand):
         }
 
     def execute(self, args) -> dict:
+        if args.convert_report:
+            log.always(trn("Converting the report at [cyan]%s[/cyan]") % rich_guard(args.convert_report))
+            return {CONVERTED_REPORT_KEY: convert_json_report(args.convert_report, args.compression)}
+
+        if args.fix:
+            files = get_xml_files_and_log(args.paths, trn("Fixing pattern errors in"))
+            fix_report = {}
+            self.process_files_with_progressbar(args, files, fix_report, False)
+            return {FIX_REPORT_KEY: fix_report}
+
         files = get_xml_files_and_log(args.paths, trn("Analyzing patterns usage and errors"))
 
         results = {}
@@ -273,13 +450,29 @@ class AnalyzePatterns(AbstractCommand):
         if args.save:
             filename = build_file_name()
             log.always(trn("Saving the report at [cyan]%s[/cyan]") % rich_guard(filename))
-            serialize_analysis(results, filename)
+            save_compact_analysis(per_file_results.items(), results[META_DATA_KEY], filename, args.compression)
+
+        if args.compare:
+            log.always(trn("Comparing with the report at [cyan]%s[/cyan]") % rich_guard(args.compare))
+            results[COMPARISON_KEY] = compare_analyses(args.compare, results)
 
         return results
 
     # Displaying
     ############
     def display_result(self, result: dict):
+        if CONVERTED_REPORT_KEY in result:
+            log.always(cf_green(trn("Report converted to [cyan]%s[/cyan]") % rich_guard(result[CONVERTED_REPORT_KEY])))
+            return
+
+        if FIX_REPORT_KEY in result:
+            display_fix_report(result[FIX_REPORT_KEY])
+            return
+
+        if COMPARISON_KEY in result:
+            display_comparison(result[COMPARISON_KEY])
+            return
+
         log.always(trn("Displaying report"))
         log.always(trn("Summary:"))
 
@@ -310,7 +503,7 @@ class AnalyzePatterns(AbstractCommand):
                     cause = error['type']
                     snippet_lines = error['snippet'].split("\n")
 
-                    log.always(cf_red(trn("Error: %s")) % cause + trn(". Row: %s, column %s") % (row, col))
+                    log.always(format_severity(error.get('severity')) % cause + trn(". Row: %s, column %s") % (row, col))
                     for line in snippet_lines:
                         log.always(trn("[grey53]%s") % line)
                     log.always("")
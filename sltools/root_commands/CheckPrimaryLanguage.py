@@ -7,11 +7,10 @@ from sltools.baseline.config import UNKNOWN_LANG, TOO_LITTLE_DATA, min_recogniza
 from sltools.log_config_loader import log
 from sltools.utils.colorize import cf_green, cf_red, cf_cyan
 from sltools.utils.error_utils import interpret_error
-from sltools.utils.file_utils import read_xml
 from sltools.utils.lang_utils import trn
 from sltools.utils.misc import create_table, detect_language, color_lang
 from sltools.utils.plain_text_utils import purify_text
-from sltools.utils.xml_utils import parse_xml_root, extract_text_from_xml
+from sltools.utils.xml_utils import iter_strings, join_texts
 
 
 class CheckPrimaryLanguage(AbstractCommand):
@@ -42,10 +41,7 @@ class CheckPrimaryLanguage(AbstractCommand):
         exclude_langs = args.exclude_langs
         detailed = args.detailed or False
         stats = {UNKNOWN_LANG: 0, TOO_LITTLE_DATA: 0}
-        xml_string = read_xml(file_path)
-
-        root = parse_xml_root(xml_string)
-        texts = [elem.text for elem in root.xpath('//text') if elem.text and elem.text.strip()]
+        texts = [text for _, text, _ in iter_strings(file_path) if text and text.strip()]
 
         if detailed:
             for text in texts:
@@ -65,7 +61,7 @@ class CheckPrimaryLanguage(AbstractCommand):
 
                 stats[language] = stats.get(language, 0) + 1
 
-        all_text = extract_text_from_xml(xml_string)
+        all_text = join_texts(texts)
         all_text = purify_text(all_text)
         try:
             main_lang, _ = detect_language(all_text)
@@ -24,6 +24,8 @@ class Config(AbstractCommand):
         parser.add_argument('--language', help=trn('Set app language. (Available: %s)') % ["en", "uk"])
         parser.add_argument('--show-stacktrace', action=BooleanAction, type=str, default=None,
                             help=trn('Enable/Disable showing error stack trace (Available: True/False)'))
+        parser.add_argument('--include-roots',
+                            help=trn('Set directories to resolve #include paths against (separate multiple paths with "|")'))
 
     # Execution
     ###########
@@ -51,6 +53,10 @@ class Config(AbstractCommand):
             else:
                 console.print(cf_cyan(trn("Stacktrace printing on failure DISABLED")))
 
+        if args.include_roots is not None:
+            config_manager.update_config('xml', 'include_roots', args.include_roots)
+            console.print(cf_cyan(trn("Set new #include roots to '%s'") % args.include_roots))
+
         return {}
 
     # Displaying
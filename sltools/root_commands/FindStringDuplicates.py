@@ -1,43 +1,37 @@
+import bisect
+import fnmatch
 import json
-import sys
+import os
 from collections import defaultdict
 from datetime import datetime
 
 from sltools.baseline.command_baseline import AbstractCommand
 from sltools.baseline.common import get_xml_files_and_log
+from sltools.baseline.config import file_changes_debounce_window
 from sltools.log_config_loader import log
-from sltools.utils.colorize import cf_yellow, cf_cyan
+from sltools.utils.colorize import cf_yellow, cf_cyan, rich_guard
 from sltools.utils.error_utils import interpret_error
-from sltools.utils.file_utils import read_xml
+from sltools.utils.index_utils import hash_text
 from sltools.web_server.flask_server import run_flask_server
 from sltools.utils.lang_utils import trn
 from sltools.utils.misc import set_default
-from sltools.utils.xml_utils import parse_xml_root
+from sltools.utils.occurrence_utils import StringOccurrences
+from sltools.utils.similarity_utils import find_similar_text_clusters
+from sltools.utils.xml_utils import iter_strings
 
 
-def list_strings_from_all_files(files):
+def build_file_to_string_mapping(occurrences: StringOccurrences):
+    """
+    Returns:
+        dict: File path -> string id -> hash of the text (for the visualizer), in document order.
+    """
     results = {}
-
-    for file in files:
-        try:
-            xml_string_tags, _ = list_strings(file)
-            strings = {}
-            for string_tag in xml_string_tags:
-                strings[string_tag.get("id")] = hash(string_tag.find("text").text.strip())
-            results[file] = strings
-        except Exception as e:
-            log.error(trn("Can't get strings for file: '%s'. Error: %s") % (file, interpret_error(e)))
-
+    for file_index, file_path in enumerate(occurrences.file_paths()):
+        results[file_path] = {occurrence.string_id: hash_text(occurrence.text)
+                              for occurrence in occurrences.file_occurrences(file_index)}
     return results
 
 
-def list_strings(file_path):
-    xml_string = read_xml(file_path)
-    root = parse_xml_root(xml_string)
-    strings_element_list = root.findall(".//string")
-    return strings_element_list, xml_string
-
-
 def init_file_overlaps_dict():
     return defaultdict(lambda:
                        {
@@ -66,34 +60,319 @@ def filter_sorted_data(sorted_data_dict: dict) -> dict:
     return filtered_data_dict
 
 
-def analyze_file_overlaps(indexed_data):
-    # Create a dictionary to hold unique string IDs for each file
-    file_string_ids = defaultdict(set)
-
-    for string_id, data_list in indexed_data.items():
-        for entry in data_list:
-            file_string_ids[entry['file_path']].add(string_id)
+def analyze_file_overlaps(occurrences: StringOccurrences):
+    """
+    Occurrences are an inverted index (id -> files) already, so only files which share some id
+    are visited instead of comparing every file with every other file.
+    """
+    # Create a set of unique string IDs for each file (files are referred by their indices)
+    file_string_ids = [set(occurrence.string_id for occurrence in occurrences.file_occurrences(file_index))
+                       for file_index in range(len(occurrences.file_paths()))]
+
+    # File index -> file index -> ids they share
+    shared_ids = [{} for _ in file_string_ids]
+
+    # Only ids present in several files make overlaps
+    for string_id, id_occurrences in occurrences.items():
+        if len(id_occurrences) < 2:
+            continue
+        id_files = set(occurrence.file_index for occurrence in id_occurrences)
+        if len(id_files) < 2:
+            continue
+        for file1 in id_files:
+            file_shared_ids = shared_ids[file1]
+            for file2 in id_files:
+                if file1 != file2:
+                    file_shared_ids.setdefault(file2, set()).add(string_id)
 
-    # Compare each file's string IDs with every other file's string IDs
     overlaps_data = init_file_overlaps_dict()
-    files = list(file_string_ids.keys())
-    for i, file1 in enumerate(files):
-        overlaps_data[file1]["total_id_cnt"] = len(file_string_ids[file1])
-
-        for j, file2 in enumerate(files):
-            if i != j:
-                overlapping_ids = file_string_ids[file1].intersection(file_string_ids[file2])
-                overlap_count = len(overlapping_ids)
-                if overlap_count > 0:
-                    overlaps_data[file1]["overlaps"][file2]["total_id_cnt"] = len(file_string_ids[file2])
-                    overlaps_data[file1]["overlaps"][file2]['match_count'] = overlap_count
-                    overlaps_data[file1]["overlaps"][file2]['overlapping_ids'] = overlapping_ids
+    for file1, string_ids in enumerate(file_string_ids):
+        file_path = occurrences.file_path(file1)
+        overlaps_data[file_path]["total_id_cnt"] = len(string_ids)
+        # Overlapping files are kept in the order of files, so ties are sorted the same way every time
+        for file2 in sorted(shared_ids[file1]):
+            overlapping_ids = shared_ids[file1][file2]
+            overlap = overlaps_data[file_path]["overlaps"][occurrences.file_path(file2)]
+            overlap["total_id_cnt"] = len(file_string_ids[file2])
+            overlap['match_count'] = len(overlapping_ids)
+            overlap['overlapping_ids'] = overlapping_ids
 
     # Sort the overlaps
     sorted_overlaps = sort_overlaps(overlaps_data)
     return filter_sorted_data(sorted_overlaps)
 
 
+def digest_file_strings(strings: dict):
+    # Stable across runs (unlike hash(), which is salted per process)
+    return hash_text(''.join('%s\0%s\n' % item for item in strings.items()))
+
+
+def read_file_string_hashes(file_path):
+    """
+    Returns:
+        dict: String id -> hash of the text, in document order (as in file_to_string_mapping).
+    """
+    strings = {}
+    try:
+        for string_id, text, _ in iter_strings(file_path):
+            # Strings without id are skipped, as by the initial analysis (which warns about them)
+            if string_id is None:
+                continue
+            strings[string_id] = hash_text((text or "").strip())
+    except Exception as e:
+        log.error(trn("Can't process strings for file: '%s'. Error: %s") % (file_path, interpret_error(e)))
+    return strings
+
+
+class LiveDuplicatesReport:
+    """
+    Duplicates report of the web visualizer, which is updated file by file.
+    Strings of every file, the inverted index (id -> files) and overlaps between files are kept in memory,
+    so a change of a file touches only the files sharing ids with it, and only the changed file is reread.
+    Overlaps report entries are rebuilt (and resorted) only for those files. Publishing the report copies
+    the ordered list of files (shallow), which is still linear in the number of files, but cheap.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+        # File path -> string id -> text hash. Inner dicts are replaced, not modified, so reports can share them
+        self.file_strings = {}
+        # File path -> digest of its strings. Report hash is derived from them
+        self.file_digests = {}
+        # File path -> sequence number. Overlaps are kept in the order of files, so ties are sorted the same way
+        self.file_order = {}
+        # String id -> files defining it (dict is used as ordered set)
+        self.id_files = {}
+        # File path -> file path -> ids they share
+        self.shared_ids = {}
+        # Absolute path -> file path as used in the report
+        self.known_paths = {}
+        self.next_order = 0
+        # Files changed since the last delta of the report
+        self.changed_files = set()
+        # File path -> its entry of the overlaps report. Entries are replaced, not modified, so reports can share them
+        self.file_entries = {}
+        # Sorted (-total match count, file order, file path) of files with overlaps, i.e. order of the report
+        self.report_order = []
+        # File path -> its key in the report order
+        self.report_keys = {}
+        # Files whose entries are outdated
+        self.affected_files = set()
+
+    def load(self, occurrences: StringOccurrences):
+        for file_path, strings in build_file_to_string_mapping(occurrences).items():
+            self.set_file_strings(file_path, strings)
+        self.changed_files.clear()
+
+    def set_file_strings(self, file_path, strings: dict) -> bool:
+        """
+        Returns:
+            bool: Whether the report has changed.
+        """
+        digest = digest_file_strings(strings)
+        if file_path in self.file_strings:
+            if self.file_digests[file_path] == digest:
+                return False
+            self.__unlink_file(file_path)
+        else:
+            self.file_order[file_path] = self.next_order
+            self.next_order += 1
+            self.known_paths[os.path.abspath(file_path)] = file_path
+
+        self.file_strings[file_path] = strings
+        self.file_digests[file_path] = digest
+        file_shared_ids = self.shared_ids.setdefault(file_path, {})
+        for string_id in strings:
+            id_files = self.id_files.setdefault(string_id, {})
+            for other_file in id_files:
+                file_shared_ids.setdefault(other_file, set()).add(string_id)
+                self.shared_ids[other_file].setdefault(file_path, set()).add(string_id)
+            id_files[file_path] = None
+        # Entries of other files show count of ids in this file, so all of them are outdated
+        self.affected_files.update(file_shared_ids)
+        self.affected_files.add(file_path)
+        self.changed_files.add(file_path)
+        return True
+
+    def remove_file(self, file_path) -> bool:
+        if file_path not in self.file_strings:
+            return False
+        self.__unlink_file(file_path)
+        del self.file_strings[file_path]
+        del self.file_digests[file_path]
+        del self.file_order[file_path]
+        del self.known_paths[os.path.abspath(file_path)]
+        self.affected_files.add(file_path)
+        self.changed_files.add(file_path)
+        return True
+
+    def __unlink_file(self, file_path):
+        # Removes strings of the file from the inverted index and overlaps
+        self.affected_files.update(self.shared_ids[file_path])
+        for string_id in self.file_strings[file_path]:
+            id_files = self.id_files[string_id]
+            del id_files[file_path]
+            if len(id_files) == 0:
+                del self.id_files[string_id]
+            for other_file in id_files:
+                other_shared_ids = self.shared_ids[other_file]
+                shared_ids = other_shared_ids[file_path]
+                shared_ids.discard(string_id)
+                if len(shared_ids) == 0:
+                    del other_shared_ids[file_path]
+        del self.shared_ids[file_path]
+
+    def get_report_path(self, abs_path):
+        """
+        Returns:
+            str: Path of a new file in the same form as files found under the paths, or None if it isn't watched.
+        """
+        for path in self.paths:
+            abs_watched_path = os.path.abspath(path)
+            if os.path.isdir(abs_watched_path):
+                if abs_path.startswith(os.path.join(abs_watched_path, '')) and abs_path.endswith('.xml'):
+                    return os.path.join(path, os.path.relpath(abs_path, abs_watched_path))
+            elif fnmatch.fnmatch(abs_path, abs_watched_path):
+                return abs_path if os.path.isabs(path) else os.path.relpath(abs_path)
+        return None
+
+    def update_file(self, file_path) -> bool:
+        """
+        Rereads the file after it was modified, created or deleted.
+
+        Returns:
+            bool: Whether the report has changed.
+        """
+        abs_path = os.path.abspath(file_path)
+        known_path = self.known_paths.get(abs_path)
+        if not os.path.isfile(abs_path):
+            return known_path is not None and self.remove_file(known_path)
+
+        if known_path is None:
+            known_path = self.get_report_path(abs_path)
+            if known_path is None:
+                return False
+        return self.set_file_strings(known_path, read_file_string_hashes(known_path))
+
+    def __update_entry(self, file_path):
+        key = self.report_keys.pop(file_path, None)
+        if key is not None:
+            del self.report_order[bisect.bisect_left(self.report_order, key)]
+            del self.file_entries[file_path]
+
+        file_shared_ids = self.shared_ids.get(file_path)
+        if not file_shared_ids:
+            # Report has only files with duplicates
+            return
+
+        # Same order as sort_overlaps gives: by match count, ties in the order of files
+        other_files = sorted(file_shared_ids, key=lambda other_file: (-len(file_shared_ids[other_file]),
+                                                                       self.file_order[other_file]))
+        overlaps = {}
+        for other_file in other_files:
+            overlaps[other_file] = {
+                'total_id_cnt': len(self.file_strings[other_file]),
+                'match_count': len(file_shared_ids[other_file]),
+                'overlapping_ids': set(file_shared_ids[other_file])
+            }
+        self.file_entries[file_path] = {"overlaps": overlaps, "total_id_cnt": len(self.file_strings[file_path])}
+
+        key = (-sum(len(ids) for ids in file_shared_ids.values()), self.file_order[file_path], file_path)
+        self.report_keys[file_path] = key
+        bisect.insort(self.report_order, key)
+
+    def report(self):
+        """
+        Returns:
+            dict: Visualization data, same as built by find_and_prepare_duplicates_report.
+            It doesn't share mutable state with the live report.
+        """
+        for file_path in self.affected_files:
+            self.__update_entry(file_path)
+        self.affected_files.clear()
+
+        return {
+            "overlaps_report": {file_path: self.file_entries[file_path] for _, _, file_path in self.report_order},
+            "file_to_string_mapping": dict(self.file_strings)
+        }
+
+    def report_hash(self):
+        return hash_text(''.join('%s\0%s\n' % item for item in self.file_digests.items()))
+
+    def report_delta(self, previous_report, report):
+        """
+        Changes between two reports caused by the files changed since the previous delta.
+        Only overlaps of the changed files are compared, so the delta is proportional to the edit.
+
+        Returns:
+            dict: Changed and removed files (with their string mappings) and added, changed and removed
+            overlaps as [file1, file2, overlap] ([file1, file2] for removed ones), both directions included.
+        """
+        changed_files, self.changed_files = self.changed_files, set()
+        previous_overlaps = previous_report["overlaps_report"]
+        overlaps = report["overlaps_report"]
+
+        def get_overlap(overlaps_report, file1, file2):
+            return overlaps_report.get(file1, {}).get("overlaps", {}).get(file2)
+
+        pairs = set()
+        for file_path in changed_files:
+            for overlaps_report in (previous_overlaps, overlaps):
+                for other_file in overlaps_report.get(file_path, {}).get("overlaps", {}):
+                    pairs.add((file_path, other_file))
+                    pairs.add((other_file, file_path))
+
+        added, changed, removed = [], [], []
+        for file1, file2 in sorted(pairs):
+            previous_overlap = get_overlap(previous_overlaps, file1, file2)
+            overlap = get_overlap(overlaps, file1, file2)
+            if previous_overlap is None:
+                added.append([file1, file2, overlap])
+            elif overlap is None:
+                removed.append([file1, file2])
+            elif overlap != previous_overlap:
+                changed.append([file1, file2, overlap])
+
+        previous_mapping = previous_report["file_to_string_mapping"]
+        mapping = report["file_to_string_mapping"]
+        return {
+            "files": {
+                "changed": {file_path: mapping[file_path] for file_path in sorted(changed_files)
+                            if file_path in mapping and mapping[file_path] != previous_mapping.get(file_path)},
+                "removed": sorted(file_path for file_path in changed_files
+                                  if file_path not in mapping and file_path in previous_mapping)
+            },
+            "overlaps": {"added": added, "changed": changed, "removed": removed}
+        }
+
+
+def find_near_duplicates(occurrences: StringOccurrences, threshold):
+    """
+    Returns:
+        list: Clusters of strings with similar texts (only clusters with several different ids).
+    """
+    all_occurrences = [occurrence for file_index in range(len(occurrences.file_paths()))
+                       for occurrence in occurrences.file_occurrences(file_index)]
+    clusters = find_similar_text_clusters([occurrence.text for occurrence in all_occurrences], threshold)
+
+    near_duplicates = []
+    for similarity, indices in clusters:
+        cluster_occurrences = [all_occurrences[i] for i in indices]
+        # Same id in several files is an exact duplicate, which is reported without --near-duplicates
+        if len(set(occurrence.string_id for occurrence in cluster_occurrences)) < 2:
+            continue
+        near_duplicates.append({
+            "similarity": similarity,
+            "strings": [{
+                "id": occurrence.string_id,
+                "file_path": occurrences.file_path(occurrence.file_index),
+                "line": occurrence.line,
+                "text": occurrence.text
+            } for occurrence in cluster_occurrences]
+        })
+    return near_duplicates
+
+
 class FindStringDuplicates(AbstractCommand):
     # Metadata
     ##########
@@ -111,56 +390,77 @@ class FindStringDuplicates(AbstractCommand):
                             help=trn('Display detailed report with string text'))
         parser.add_argument('--web-visualizer', action='store_true', default=False,
                             help=trn('Display duplicates as D3 interactive graph'))
+        parser.add_argument('--debounce', type=float, default=None,
+                            help=trn('Seconds to wait for more file changes before updating web visualizer (default: %s)')
+                            % file_changes_debounce_window)
         parser.add_argument('--save-report', action='store_true', default=False,
                             help=trn('Save filecentric report as JSON'))
+        parser.add_argument('--near-duplicates', action='store_true', default=False,
+                            help=trn('Look for strings with similar texts under different ids instead'))
+        parser.add_argument('--threshold', type=float, default=0.9,
+                            help=trn('Minimal similarity of near duplicates (0..1)'))
         parser.add_argument('paths', nargs='*', help=trn('Paths to files or directories'))
 
     # Execution
     ###########
-    def _process_file(self, file_path, results: dict, args):
+    def _process_file(self, file_path, results: StringOccurrences, args):
+        file_index = results.add_file(file_path)
         try:
-            strings_element_list, xml_string = list_strings(file_path)
-            for string_elem in strings_element_list:
-                string_id = string_elem.get("id")
-                text_elem = string_elem.find("text")
-                text_content = text_elem.text.strip() if text_elem is not None else ""
-
-                line_num = xml_string.count('\n', 0, xml_string.find(string_id)) + 1
-
-                data_obj = {
-                    "file_path": file_path,
-                    "text": text_content,
-                    "line": line_num
-                }
-
-                if string_id in results:
+            for string_id, text, line_num in iter_strings(file_path):
+                if string_id is None:
+                    log.warning(trn("String without id in file: '%s', line: %s. Skipped") % (file_path, line_num))
+                    continue
+                if string_id in results.by_id:
                     log.warning(trn("Found duplicate of '%s' in '%s'") % (string_id, file_path))
-                    results[string_id].append(data_obj)
-                else:
-                    results[string_id] = [data_obj]
+                results.add(file_index, string_id, line_num, (text or "").strip())
         except Exception as e:
             log.error(trn("Can't process strings for file: '%s'. Error: %s") % (file_path, interpret_error(e)))
 
-    def find_and_prepare_duplicates_report(self, args):
-        files = get_xml_files_and_log(args.paths, trn("Analyzing patterns for"))
+    def collect_occurrences(self, args, action_msg):
+        files = get_xml_files_and_log(args.paths, action_msg)
 
-        results = {}
+        results = StringOccurrences()
         self.process_files_with_progressbar(args, files, results, True)
+        return results
+
+    def find_and_prepare_duplicates_report(self, args):
+        results = self.collect_occurrences(args, trn("Analyzing patterns for"))
         overlaps = analyze_file_overlaps(results)
         visualization_data = {
             "overlaps_report": overlaps,
-            "file_to_string_mapping": list_strings_from_all_files(files)
+            "file_to_string_mapping": build_file_to_string_mapping(results)
         }
         return results, visualization_data
 
+    def find_near_duplicates_report(self, args):
+        if not 0 < args.threshold <= 1:
+            raise ValueError(trn("Threshold must be in range (0, 1], got: %s") % args.threshold)
+
+        results = self.collect_occurrences(args, trn("Looking for near duplicates in"))
+        near_duplicates = find_near_duplicates(results, args.threshold)
+
+        if args.save_report:
+            timestamp = datetime.now()
+            with open(trn("near-duplicates-report-%s.json") % timestamp, 'w', encoding='utf-8') as f:
+                json.dump(near_duplicates, f, ensure_ascii=False, indent=4)
+
+        return {"near_duplicates": near_duplicates}
+
     def execute(self, args) -> dict:
-        def fsd_wrapper_for_ws(_args, is_read_only):
-            return self.find_and_prepare_duplicates_report(_args)
+        def live_report_for_ws(_args):
+            live_report = LiveDuplicatesReport(_args.paths)
+            live_report.load(self.collect_occurrences(_args, trn("Analyzing patterns for")))
+            return live_report
 
         if args.web_visualizer:
-            run_flask_server(args, fsd_wrapper_for_ws)
+            if args.debounce is not None and args.debounce < 0:
+                raise ValueError(trn("Debounce window can't be negative, got: %s") % args.debounce)
+            run_flask_server(args, live_report_for_ws)
             return {}
 
+        if args.near_duplicates:
+            return self.find_near_duplicates_report(args)
+
         report, visualization_data = self.find_and_prepare_duplicates_report(args)
 
         if args.save_report:
@@ -177,6 +477,10 @@ class FindStringDuplicates(AbstractCommand):
             log.always(trn("Nothing to report"))
             return
 
+        if "near_duplicates" in result:
+            self.__display_near_duplicates(result["near_duplicates"])
+            return
+
         per_string_report = result["per_string_report"]
         report = result["report"]
         visualization_data = result["visualization_data"]
@@ -186,7 +490,7 @@ class FindStringDuplicates(AbstractCommand):
             self.__display_per_file_overlaps(visualization_data["overlaps_report"])
 
     @staticmethod
-    def __display_per_string(results):
+    def __display_per_string(results: StringOccurrences):
         if len(results) == 0:
             log.always(trn("No duplicates found! Great news"))
 
@@ -199,19 +503,36 @@ class FindStringDuplicates(AbstractCommand):
                 log.always(msg)
                 log.always(cf_yellow(len_msg))
                 for i, candidate in enumerate(data_list, 1):
-                    file_path = candidate['file_path']
-                    line = candidate['line']
-                    text = candidate['text']
+                    file_path = results.file_path(candidate.file_index)
+                    line = candidate.line
+                    text = candidate.text
                     log.always(cf_cyan(trn("Candidate #d:") % i))
                     log.always(trn("File: '%s', line: %s") % (file_path, line))
                     log.always(trn("Text: '%s'\n") % cf_yellow(text))
 
         # Print memory footprint
-        memory_size = sys.getsizeof(results)
-        for data_list in results.values():
-            memory_size += sum(sys.getsizeof(i) for i in data_list)
+        memory_size = results.memory_footprint()
         log.log(trn("\nMemory footprint of the report for the dictionary: %.2d KB") % (memory_size / 1024))
 
+    @staticmethod
+    def __display_near_duplicates(clusters):
+        if len(clusters) == 0:
+            log.always(trn("No near duplicates found"))
+            return
+
+        for i, cluster in enumerate(clusters, 1):
+            msg = trn("Cluster #%d: %d similar strings (similarity >= %.2f)") % (i, len(cluster["strings"]), cluster["similarity"])
+            len_msg = len(msg) * "#"
+            log.always(cf_yellow(len_msg))
+            log.always(msg)
+            log.always(cf_yellow(len_msg))
+            for string in cluster["strings"]:
+                log.always(cf_cyan(trn("String '%s'") % string["id"]))
+                log.always(trn("File: '%s', line: %s") % (string["file_path"], string["line"]))
+                log.always(trn("Text: '%s'\n") % cf_yellow(rich_guard(string["text"])))
+
+        log.always(trn("Total clusters of near duplicates: %d") % len(clusters))
+
     @staticmethod
     def __display_per_file_overlaps(overlaps, show_unique=False):
         if len(overlaps) == 0:
@@ -3,6 +3,7 @@ from sltools.baseline.config import PRIMARY_ENCODING
 from sltools.log_config_loader import log
 from sltools.root_commands.ValidateEncoding import ValidateEncoding
 from sltools.utils.colorize import cf_green, cf_red, cf_yellow, cf_cyan
+from sltools.utils.encoding_utils import MIXED_ENCODING, classify_encoding_segments, normalize_segments_to_primary_encoding
 from sltools.utils.error_utils import log_and_save_error, display_encoding_error_details
 from sltools.utils.file_utils import read_xml
 from sltools.utils.lang_utils import trn
@@ -24,6 +25,18 @@ def change_file_encoding(file_name, e_from, e_to):
         raise e
 
 
+def fix_mixed_file_encoding(file_name):
+    with open(file_name, 'rb') as file:
+        binary_text = file.read()
+
+    segments = classify_encoding_segments(binary_text)
+    # Nothing is written unless all segments were successfully normalized
+    normalized_text = normalize_segments_to_primary_encoding(binary_text, segments)
+
+    with open(file_name, 'wb') as file:
+        file.write(normalized_text)
+
+
 class FixEncoding(AbstractCommand):
     # Metadata
     ##########
@@ -58,6 +71,20 @@ class FixEncoding(AbstractCommand):
             except (UnicodeEncodeError, UnicodeDecodeError) as e:
                 log_and_save_error(file_name, trn("Can't encode from %s to %s") % (cf_yellow(encoding), cf_yellow(PRIMARY_ENCODING)))
                 display_encoding_error_details(read_xml(file_name, encoding), str(e))
+        elif encoding == MIXED_ENCODING:
+            if not self.is_allowed_to_continue(file_name, args):
+                return
+
+            log.always(trn("Try to change encoding of each segment to %s for file %s") % (cf_green(PRIMARY_ENCODING), cf_cyan(file_name)))
+            try:
+                fix_mixed_file_encoding(file_name)
+                log.always(cf_green(trn("Success!")))
+                results["total_processed"] += 1
+            except (UnicodeEncodeError, UnicodeDecodeError) as e:
+                segment_encoding, first_line, last_line = e.segment
+                log_and_save_error(file_name, trn("Can't encode lines %d-%d from %s to %s") % (first_line, last_line, cf_yellow(segment_encoding), cf_yellow(PRIMARY_ENCODING)))
+                segment_text = e.object if isinstance(e.object, str) else e.object.decode(PRIMARY_ENCODING, errors='replace')
+                display_encoding_error_details(segment_text, str(e))
         else:
             log.debug(trn("File %s possibly has %s encoding. But I'm not sure, so I won't do anything") % (file_name, encoding))
 
@@ -69,7 +96,7 @@ class FixEncoding(AbstractCommand):
         log.always(cf_yellow(trn("NOTE! Currently, reliable detection is only available for UTF-8 encoding.")))
         log.always(trn("For other suspicious files, manual review and encoding correction may be necessary."))
 
-        supported_results = list(filter(lambda t: t[1].lower() == 'utf-8', validation_results["report"]))
+        supported_results = list(filter(lambda t: t[1].lower() in ['utf-8', MIXED_ENCODING], validation_results["report"]))
         if len(supported_results) == 0:
             log.always(trn("Nothing to fix"))
             return {}
@@ -9,8 +9,7 @@ from sltools.utils.file_utils import read_xml, save_xml
 from sltools.utils.lang_utils import trn
 from sltools.utils.misc import create_table, exception_originates_from
 from sltools.utils.plain_text_utils import tabwidth, format_text_entry
-from sltools.utils.xml_utils import fix_possible_errors, format_xml_string, parse_xml_root, indent, to_utf_string_with_proper_declaration, \
-    add_blank_line_before_comments
+from sltools.utils.xml_utils import fix_possible_errors, format_xml_string, parse_xml_root, format_xml_root
 
 error_str = cf_red(trn("Error"))
 
@@ -28,15 +27,7 @@ def format_xml_text_entries(text_formatted_xml, indent_level) -> (str, bool):
                 log.info(trn("Text of '%s' was formatted") % str_id)
                 was_formatted = True
 
-    indent(root)
-
-    # Convert the XML tree to a string
-    formatted_xml = to_utf_string_with_proper_declaration(root)
-
-    # Add a blank line before comments
-    updated_xml_str = add_blank_line_before_comments(formatted_xml)
-
-    return updated_xml_str.strip() + "\n", was_formatted
+    return format_xml_root(root), was_formatted
 
 
 def to_yes_no(b: bool) -> str:
@@ -140,15 +131,7 @@ class FormatXml(AbstractCommand):
                     log.info(trn("Text of '%s' was formatted") % str_id)
                     was_formatted = True
 
-        indent(root)
-
-        # Convert the XML tree to a string
-        formatted_xml = to_utf_string_with_proper_declaration(root)
-
-        # Add a blank line before comments
-        updated_xml_str = add_blank_line_before_comments(formatted_xml)
-
-        return updated_xml_str.strip() + "\n", was_formatted
+        return format_xml_root(root), was_formatted
 
     def execute(self, args) -> dict:
         apply_fix = args.fix
@@ -0,0 +1,61 @@
+import os
+
+from rich import get_console
+
+from sltools.baseline.command_baseline import AbstractCommand
+from sltools.log_config_loader import log
+from sltools.utils.colorize import cf_green
+from sltools.utils.index_utils import StringIndexDb, DEFAULT_INDEX_PATH
+from sltools.utils.lang_utils import trn
+from sltools.utils.misc import create_table
+
+
+class Query(AbstractCommand):
+    # Metadata
+    ##########
+    def get_name(self) -> str:
+        return "query"
+
+    def get_aliases(self) -> list:
+        return ['q']
+
+    def _get_help(self) -> str:
+        return trn('Look up string definitions in the index built with [cyan]index build[/cyan]')
+
+    def _setup_parser_args(self, parser):
+        lookup = parser.add_mutually_exclusive_group(required=True)
+        lookup.add_argument('--id', dest='string_id', help=trn('Find where string with the id is defined'))
+        lookup.add_argument('--prefix', help=trn('Find strings with ids starting with the prefix'))
+        lookup.add_argument('--file', help=trn('List strings defined in the file'))
+        parser.add_argument('--db', default=DEFAULT_INDEX_PATH, help=trn('Path to the index database'))
+
+    # Execution
+    ###########
+    def _process_file(self, file_path, results: dict, args):
+        pass
+
+    def execute(self, args) -> dict:
+        with StringIndexDb(args.db, create=False) as db:
+            if args.string_id is not None:
+                rows = db.find_by_id(args.string_id)
+            elif args.prefix is not None:
+                rows = db.find_by_prefix(args.prefix)
+            else:
+                rows = db.find_by_file(args.file)
+
+        return {"rows": rows}
+
+    # Displaying
+    ############
+    def display_result(self, result: dict):
+        rows = result["rows"]
+        if len(rows) == 0:
+            log.always(trn("Nothing found"))
+            return
+
+        table = create_table([trn("String id"), trn("File"), trn("Line"), trn("Language"), trn("Encoding")])
+        for string_id, file_path, line, language, encoding, _ in rows:
+            # Index stores absolute paths
+            table.add_row(string_id, os.path.relpath(file_path), str(line), language, encoding)
+        get_console().print(table)
+        log.always(trn("Found: %s") % cf_green(len(rows)))
@@ -0,0 +1,88 @@
+import os
+import re
+
+from rich import get_console
+
+from sltools.baseline.command_baseline import AbstractCommand
+from sltools.log_config_loader import log
+from sltools.utils.colorize import cf_green, cf_cyan, rich_guard
+from sltools.utils.index_utils import StringIndexDb, DEFAULT_INDEX_PATH
+from sltools.utils.lang_utils import trn
+from sltools.utils.misc import create_table
+from sltools.utils.search_utils import required_substrings, to_fts_query
+
+
+def highlight_matches(text, regex):
+    highlighted = []
+    last_end = 0
+    for match in regex.finditer(text):
+        if match.end() == match.start():
+            continue
+        highlighted.append(rich_guard(text[last_end:match.start()]))
+        highlighted.append("[bold red]%s[/bold red]" % rich_guard(match.group()))
+        last_end = match.end()
+    highlighted.append(rich_guard(text[last_end:]))
+    return ''.join(highlighted)
+
+
+class Search(AbstractCommand):
+    # Metadata
+    ##########
+    def get_name(self) -> str:
+        return "search"
+
+    def get_aliases(self) -> list:
+        return ['s']
+
+    def _get_help(self) -> str:
+        return trn('Search texts (without colors and placeholders) by regex in the index built with [cyan]index build[/cyan]')
+
+    def _setup_parser_args(self, parser):
+        parser.add_argument('pattern', help=trn('Regular expression to search for'))
+        parser.add_argument('-i', '--ignore-case', action='store_true', default=False, help=trn('Ignore case'))
+        parser.add_argument('--limit', type=int, default=None, help=trn('Show only first N matches'))
+        parser.add_argument('--db', default=DEFAULT_INDEX_PATH, help=trn('Path to the index database'))
+
+    # Execution
+    ###########
+    def _process_file(self, file_path, results: dict, args):
+        pass
+
+    def execute(self, args) -> dict:
+        flags = re.IGNORECASE if args.ignore_case else 0
+        regex = re.compile(args.pattern, flags)
+
+        # Trigram index narrows down candidates, regex confirms them
+        query_tree = required_substrings(args.pattern)
+        fts_query = to_fts_query(query_tree) if query_tree is not None else None
+        if fts_query is None:
+            log.info(trn("Pattern has no substrings of 3+ characters. All texts are scanned"))
+        else:
+            log.debug(trn("Trigram query: %s") % fts_query)
+
+        candidates = 0
+        matches = []
+        with StringIndexDb(args.db, create=False) as db:
+            for string_id, file_path, line, text in db.iter_texts(fts_query):
+                candidates += 1
+                if regex.search(text):
+                    matches.append((string_id, file_path, line, text))
+
+        matches.sort(key=lambda match: (match[1], match[2]))
+        return {"regex": regex, "candidates": candidates, "matches": matches, "limit": args.limit}
+
+    # Displaying
+    ############
+    def display_result(self, result: dict):
+        matches = result["matches"]
+        if len(matches) == 0:
+            log.always(trn("Nothing found"))
+            return
+
+        shown = matches if result["limit"] is None else matches[:result["limit"]]
+        table = create_table([trn("String id"), trn("File"), trn("Line"), trn("Text")])
+        for string_id, file_path, line, text in shown:
+            # Index stores absolute paths
+            table.add_row(string_id, os.path.relpath(file_path), str(line), highlight_matches(text, result["regex"]))
+        get_console().print(table)
+        log.always(trn("Found: %s (candidates checked: %s)") % (cf_green(len(matches)), cf_cyan(result["candidates"])))
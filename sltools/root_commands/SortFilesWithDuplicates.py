@@ -2,42 +2,35 @@ from lxml import etree
 from rich import get_console
 
 from sltools.baseline.command_baseline import AbstractCommand
+from sltools.baseline.common import get_xml_files_and_log
 from sltools.log_config_loader import log
-from sltools.root_commands.FormatXml import to_yes_no, error_str, format_xml_text_entries
-from sltools.utils.colorize import cf_green, cf_red, cf_yellow, cf_cyan
-from sltools.utils.error_utils import log_and_save_error
+from sltools.utils.colorize import cf_green, cf_yellow, cf_cyan
+from sltools.utils.error_utils import interpret_error
 from sltools.utils.file_utils import read_xml, save_xml
-from sltools.utils.git_utils import is_allowed_to_continue
 from sltools.utils.lang_utils import trn
-from sltools.utils.misc import create_table, exception_originates_from, create_equal_length_comment_line
-from sltools.utils.plain_text_utils import tabwidth, format_text_entry
-from sltools.utils.xml_utils import fix_possible_errors, format_xml_string, parse_xml_root, indent, to_utf_string_with_proper_declaration, \
-    add_blank_line_before_comments
+from sltools.utils.misc import create_table, create_equal_length_comment_line
+from sltools.utils.occurrence_utils import StringOccurrences
+from sltools.utils.plain_text_utils import format_text_entry
+from sltools.utils.xml_utils import parse_xml_root, format_xml_root
 
 
 def sort_and_save_file(duplicates, file_path, root, sort_duplicates_only):
     log.info(trn("Processing file: '%s'") % file_path)
     sort_strings_by_id(root, duplicates, sort_duplicates_only)
-    # For each file use to save the files
-    resulting_xtr = to_utf_string_with_proper_declaration(root)
-    formatted_xml_str = format_xml_string(resulting_xtr, file_path)
-    save_xml(file_path, formatted_xml_str)
+    save_xml(file_path, format_xml_root(root))
     log.info(trn("Done with file: '%s'") % file_path)
 
 
-def find_common_string_ids(root1, root2):
-    # Get dict of elem.get("id") to elem.find("text").text
-    string_ids1 = {elem.get("id"): elem.find("text").text for elem in root1.iter("string")}
-
-    # Get map of elem.get("id") to elem.find("text").text
-    string_ids2 = {elem.get("id"): elem.find("text").text for elem in root2.iter("string")}
-
-    # Find common string IDs (duplicates) between the two sets
-    common_ids = set(string_ids1.keys()).intersection(string_ids2.keys())
-
-    # Create dict of id to True if they have the same text, else False
-    duplicates = {string_id: string_ids1[string_id] == string_ids2[string_id] for string_id in common_ids}
-
+def find_duplicated_string_ids(occurrences: StringOccurrences):
+    """
+    Returns:
+        dict: String id -> True if it has the same text in all files, else False (only ids defined in several files).
+    """
+    duplicates = {}
+    for string_id, id_occurrences in occurrences.items():
+        if len(set(occurrence.file_index for occurrence in id_occurrences)) < 2:
+            continue
+        duplicates[string_id] = len(set(occurrence.text for occurrence in id_occurrences)) == 1
     return duplicates
 
 
@@ -134,71 +127,27 @@ class SortFilesWithDuplicates(AbstractCommand):
         parser.add_argument('--sort-duplicates-only', action='store_true', default=False,
                             help=trn("Don't sort non-duplicates"))
         parser.add_argument('paths', nargs='*',
-                            help=trn('Paths to two files you want to compare and sort dups'))
+                            help=trn('Paths to files or directories you want to compare and sort dups'))
         self._add_git_override_arguments(parser)
 
     # Execution
     ###########
     def _process_file(self, file_path, results: dict, args):
-        was_fixed = False
-        text_was_formatted = False
-        was_formatted = False
-
-        report = results["report"]
         try:
-            # Try to open the file to check if it's readable
-            with open(file_path, 'r', encoding='windows_1251') as file:
-                file.read()
-
-            # Read XML from the file
-            xml_string = read_xml(file_path)
-
-            # Fix errors if needed
-            fixed_xml = xml_string
-            if args.fix:
-                fixed_xml = fix_possible_errors(xml_string, file_path)
-                if fixed_xml != xml_string:
-                    log.debug(trn("Fixed typical XML errors"))
-                    was_fixed = True
-
-            # Format the document
-            formatted = format_xml_string(fixed_xml, file_path)
-            if formatted != fixed_xml:
-                log.debug(trn("Formatted XML schema"))
-                was_formatted = True
-
-            # Optionally format text entries
-            text_formatted_xml = formatted
-            if args.format_text_entries:
-                text_formatted_xml, any_entry_formatted = format_xml_text_entries(text_formatted_xml, tabwidth * 3)
-                if any_entry_formatted:
-                    log.debug(trn("Formatted <text> entries"))
-                    text_was_formatted = True
-
-            # Save the XML back to the file
-            save_xml(file_path, text_formatted_xml)
-
-            if any([was_fixed, text_was_formatted, was_formatted]):
-                was_fix_status = to_yes_no(was_fixed) if args.fix else cf_cyan(trn("Disabled"))
-                was_text_form_status = to_yes_no(text_was_formatted) if args.format_text_entries else cf_cyan(trn("Disabled"))
-                formatted_status = to_yes_no(was_formatted)
-                report.append((file_path, was_fix_status, was_text_form_status, formatted_status))
-
+            root = parse_xml_root(read_xml(file_path))
         except Exception as e:
-            if args.fix and exception_originates_from("fix_possible_errors", e):
-                was_fix_status = error_str
-            else:
-                was_fix_status = cf_cyan(trn("Disabled")) if not args.fix else trn("No")
-            if args.format_text_entries and exception_originates_from("format_xml_text_entries", e):
-                was_text_form_status = error_str
-            else:
-                was_text_form_status = cf_cyan(trn("Disabled")) if not args.format_text_entries else "-"
-            if was_text_form_status == error_str:
-                formatted_status = cf_cyan(trn("N/a"))
-            else:
-                formatted_status = error_str
-            report.append((file_path, was_fix_status, was_text_form_status, formatted_status))
-            log_and_save_error(file_path, trn("Unhandled error %s") % e)
+            log.error(trn("Can't process strings for file: '%s'. Error: %s") % (file_path, interpret_error(e)))
+            return
+
+        occurrences = results["occurrences"]
+        file_index = occurrences.add_file(file_path)
+        for elem in root.iter("string"):
+            # Strings without id are kept as they are by sorting
+            if elem.get("id") is None:
+                continue
+            text_elem = elem.find("text")
+            occurrences.add(file_index, elem.get("id"), elem.sourceline, None if text_elem is None else text_elem.text)
+        results["roots"][file_path] = root
 
     @staticmethod
     def format_xml_text_entries(text_formatted_xml, indent_level) -> (str, bool):
@@ -214,66 +163,55 @@ class SortFilesWithDuplicates(AbstractCommand):
                     log.info(trn("Text of '%s' was formatted") % str_id)
                     was_formatted = True
 
-        indent(root)
-
-        # Convert the XML tree to a string
-        formatted_xml = to_utf_string_with_proper_declaration(root)
-
-        # Add a blank line before comments
-        updated_xml_str = add_blank_line_before_comments(formatted_xml)
-
-        return updated_xml_str.strip() + "\n", was_formatted
+        return format_xml_root(root), was_formatted
 
     def execute(self, args) -> dict:
-        file_path1 = args.paths[0]
-        file_path2 = args.paths[1]
-        sort_duplicates_only = args.sort_duplicates_only
-
-        if not is_allowed_to_continue(file_path1, args.allow_no_repo, args.allow_dirty, args.allow_not_tracked):
-            return {}
-        if not is_allowed_to_continue(file_path2, args.allow_no_repo, args.allow_dirty, args.allow_not_tracked):
-            return {}
+        # Same file given twice would duplicate itself
+        files = list(dict.fromkeys(get_xml_files_and_log(args.paths, trn("Sorting"))))
+        if len(files) < 2:
+            raise ValueError(trn("At least two files are needed to look for duplicates, got: %d") % len(files))
 
-        log.info(trn("Sorting files: '%s' and '%s'") % (file_path1, file_path2))
+        # All files are parsed once and duplicates are classified across all of them at once
+        results = {"occurrences": StringOccurrences(), "roots": {}}
+        self.process_files_with_progressbar(args, files, results, False)
+        occurrences = results["occurrences"]
 
-        # Parse XML roots for both files
-        xml_tree1 = read_xml(file_path1)
-        root1 = parse_xml_root(xml_tree1)
-        xml_tree2 = read_xml(file_path2)
-        root2 = parse_xml_root(xml_tree2)
+        duplicates = find_duplicated_string_ids(occurrences)
+        log.info(trn("Found %s duplicates") % len(duplicates))
 
-        duplicates = find_common_string_ids(root1, root2)
-        log.info(trn("Found %s duplicates" % len(duplicates.keys())))
+        report = []
+        for file_index, file_path in enumerate(occurrences.file_paths()):
+            file_ids = set(occurrence.string_id for occurrence in occurrences.file_occurrences(file_index))
+            identical = sum(1 for string_id in file_ids if duplicates.get(string_id) is True)
+            different = sum(1 for string_id in file_ids if duplicates.get(string_id) is False)
+            # Files without duplicates are left untouched
+            if identical == 0 and different == 0:
+                continue
 
-        sort_and_save_file(duplicates, file_path1, root1, sort_duplicates_only)
-        sort_and_save_file(duplicates, file_path2, root2, sort_duplicates_only)
+            sort_and_save_file(duplicates, file_path, results["roots"][file_path], args.sort_duplicates_only)
+            report.append((file_path, identical, different))
 
-        return {}
+        return {"report": report, "duplicates": duplicates}
 
     # Displaying
     ############
     def display_result(self, result: dict):
         report: list = result["report"]
-        if len(report) == 0:
-            silly_message = cf_red(trn("You've just wasted your CPU cycles 😈"))
-            log.always(cf_green(trn("No files required formatting. %s")) % silly_message)
+        duplicates: dict = result["duplicates"]
+        if len(duplicates) == 0:
+            log.always(cf_green(trn("No duplicates found. Files were left untouched")))
             return
 
-        failed_files = []
-        table_title = cf_cyan(trn("Files which were requiring some fixes/formatting (total: %d)") % len(report))
-        column_names = [trn("Filename"), trn("Fixed"), trn("Formatted <text>"), trn("Formatted")]
+        table_title = cf_cyan(trn("Sorted files (total: %d)") % len(report))
+        column_names = [trn("Filename"), trn("Identical duplicates"), trn("Different duplicates")]
         table = create_table(column_names)
 
-        for filename, fix, text_form, form in report:
-            table.add_row(filename, fix, text_form, form)
-            if fix == error_str or text_form == error_str or form == error_str:
-                failed_files.append(filename)
+        for filename, identical, different in report:
+            table.add_row(filename, cf_green(identical) if identical else "-", cf_yellow(different) if different else "-")
 
         log.always(table_title)
         get_console().print(table)
 
-        if len(failed_files) > 0:
-            log.always(cf_cyan(trn("These files have syntax/other errors in them, so they weren't formatted.")))
-            for file in failed_files:
-                log.always("\t%s" % cf_yellow(file))
-            log.always(cf_cyan(trn("Run command with --fix option to try to fix errors automatically\n")))
+        identical_cnt = sum(1 for is_identical in duplicates.values() if is_identical)
+        log.always(trn("Duplicated ids: %s identical (safe to delete from all files but one), %s with different content")
+                   % (cf_green(identical_cnt), cf_yellow(len(duplicates) - identical_cnt)))
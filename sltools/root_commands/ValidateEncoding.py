@@ -5,8 +5,9 @@ from rich import get_console
 from sltools.baseline.command_baseline import AbstractCommand
 from sltools.baseline.common import get_xml_files_and_log
 from sltools.log_config_loader import log
-from sltools.utils.colorize import cf_green, cf_red
-from sltools.utils.encoding_utils import detect_encoding, is_file_content_win1251_compatible
+from sltools.utils.colorize import cf_green, cf_red, cf_yellow
+from sltools.utils.encoding_utils import detect_encoding, is_file_content_win1251_compatible, classify_encoding_segments, is_mixed_encoding, \
+    describe_encoding_segments, MIXED_ENCODING
 from sltools.utils.lang_utils import trn
 from sltools.utils.misc import create_table
 
@@ -32,6 +33,12 @@ class ValidateEncoding(AbstractCommand):
         with open(file_path, 'rb') as f:
             binary_text = f.read()
 
+        segments = classify_encoding_segments(binary_text)
+        if is_mixed_encoding(segments):
+            comment = cf_yellow(trn("Mixed encoding (%s)") % describe_encoding_segments(segments))
+            results["report"].append((file_path, MIXED_ENCODING, comment))
+            return
+
         encoding = detect_encoding(binary_text)
         compatible, comment = is_file_content_win1251_compatible(binary_text, encoding)
         if compatible:
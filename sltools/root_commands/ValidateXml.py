@@ -1,4 +1,4 @@
-from lxml.etree import XMLSyntaxError
+from lxml import etree
 
 from sltools.baseline.command_baseline import AbstractCommand
 from sltools.baseline.common import get_xml_files_and_log
@@ -8,7 +8,9 @@ from sltools.utils.colorize import cf_green, cf_red, cf_yellow
 from sltools.utils.error_utils import interpret_error
 from sltools.utils.file_utils import read_xml
 from sltools.utils.lang_utils import trn
-from sltools.utils.xml_utils import remove_xml_declaration, analyze_xml_parser_error, EmptyXmlDocError, is_include_present, resolve_xml_includes, parse_xml_root
+from sltools.utils.include_utils import get_include_resolver, IncludeResolver, IncludeNotFoundError, IncludeCycleError
+from sltools.utils.xml_utils import remove_xml_declaration, analyze_xml_parser_error, EmptyXmlDocError, is_include_present, \
+    parse_and_validate_xml_root, XmlSchemaError, collect_xml_syntax_errors
 
 include_example = cf_red(trn('#include "some/other/file.xml"'))
 
@@ -26,6 +28,8 @@ class ValidateXml(AbstractCommand):
         return trn('Validate XML of a file or directory')
 
     def _setup_parser_args(self, parser):
+        parser.add_argument('--all-errors', action='store_true', default=False,
+                            help=trn('Report all syntax errors of a file instead of the first one'))
         parser.add_argument('paths', nargs='*', help=trn('Paths to files or directories'))
 
     # Execution
@@ -52,12 +56,6 @@ class ValidateXml(AbstractCommand):
             if not declaration_correct:
                 msg = trn("The XML declaration is incorrect")
                 issues.append(msg)
-        except XMLSyntaxError as e:
-            is_fatal, msg = analyze_xml_parser_error(e)
-            issues.append(msg)
-            if is_fatal:
-                report.append((file_path, issues))
-                return
         except ValueError as e:
             # Invalid declaration
             issues.append(str(e))
@@ -65,20 +63,39 @@ class ValidateXml(AbstractCommand):
             issues.append(trn("XML document is empty"))
 
         # 3. Check and resolve #include
-        # TODO: handle error messages if they are in included content.
+        line_origins = None
         if is_include_present(xml_string):
             msg = trn('The document has %s-like macro which is not recommended. Try to resolve') % include_example
             issues.append(msg)
 
             try:
-                xml_string = resolve_xml_includes(xml_string)
-            except FileNotFoundError as e:
-                msg = cf_red(interpret_error(e))
+                xml_string, line_origins = get_include_resolver().resolve(xml_string, file_path)
+            except IncludeNotFoundError as e:
+                msg = cf_red(interpret_error(e)) + trn(" (in '%s', line %d)") % (e.includer_path, e.line)
                 issues.append(msg)
+            except IncludeCycleError as e:
+                issues.append(cf_red(str(e)))
 
-        # 4. Parse root
+        # 4. Parse root and validate against schema
+        xml_bytes = xml_string.encode(PRIMARY_ENCODING)
         try:
-            _ = parse_xml_root(xml_string.encode(PRIMARY_ENCODING))
+            _ = parse_and_validate_xml_root(xml_bytes)
+        except XmlSchemaError as e:
+            for line, message in e.errors:
+                issues.append(trn("Schema error at line %d: %s") % (line, cf_red(message)))
+                self.append_error_origin(issues, line_origins, line)
+        except etree.XMLSyntaxError as e:
+            if args.all_errors:
+                # Parse once more, but without stopping on errors, to report all of them at once
+                for line, error_str in collect_xml_syntax_errors(xml_bytes):
+                    issues.append(interpret_error(error_str))
+                    self.append_error_origin(issues, line_origins, line)
+            else:
+                _, msg = analyze_xml_parser_error(e, file_path, xml_string)
+                issues.append(msg)
+                self.append_error_origin(issues, line_origins, e.lineno)
+            report.append((file_path, issues))
+            return
         except Exception as e:
             is_fatal, msg = analyze_xml_parser_error(e, file_path, xml_string)
             issues.append(msg)
@@ -86,20 +103,25 @@ class ValidateXml(AbstractCommand):
                 report.append((file_path, issues))
                 return
 
-        # 5. Validate against schema
-        # TODO
-
-        # 6. Validate against illegal characters
+        # 5. Validate against illegal characters
 
         # Finally
         if len(issues) > 0:
             report.append((file_path, issues))
 
+    @staticmethod
+    def append_error_origin(issues, line_origins, line):
+        # Line numbers of the resolved document are meaningless for the user, so point to the original file
+        origin = IncludeResolver.map_line(line_origins, line) if line_origins else None
+        if origin is not None:
+            issues.append(trn("Error origin: '%s', line %d") % origin)
+
     def execute(self, args) -> dict:
         files = get_xml_files_and_log(args.paths, trn("Validating XML-schema for"))
 
         result = {"report": []}
         self.process_files_with_progressbar(args, files, result, True)
+        log.debug(trn("Include graph: %s") % get_include_resolver().include_graph)
 
         return result
 
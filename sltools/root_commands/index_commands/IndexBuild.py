@@ -0,0 +1,130 @@
+import os
+import sqlite3
+
+from langdetect import LangDetectException
+
+from sltools.baseline.command_baseline import AbstractCommand
+from sltools.baseline.common import get_xml_files_and_log
+from sltools.baseline.config import TOO_LITTLE_DATA, min_recognizable_text_length
+from sltools.log_config_loader import log
+from sltools.utils.colorize import cf_green, cf_yellow, cf_cyan, cf_red
+from sltools.utils.encoding_utils import classify_encoding_segments, is_mixed_encoding, MIXED_ENCODING, ASCII_ENCODING
+from sltools.utils.error_utils import interpret_error
+from sltools.utils.index_utils import StringIndexDb, DEFAULT_INDEX_PATH, hash_text, normalize_index_path
+from sltools.utils.lang_utils import trn
+from sltools.utils.misc import detect_language
+from sltools.utils.plain_text_utils import purify_text
+from sltools.utils.xml_utils import iter_strings, join_texts
+
+
+def detect_file_encoding(binary_text):
+    segments = classify_encoding_segments(binary_text)
+    if is_mixed_encoding(segments):
+        return MIXED_ENCODING
+    return next((encoding for encoding, _, _ in segments if encoding != ASCII_ENCODING), ASCII_ENCODING)
+
+
+def detect_file_language(texts):
+    all_text = purify_text(join_texts(texts))
+    if len(all_text) < min_recognizable_text_length:
+        return TOO_LITTLE_DATA
+    try:
+        language, _ = detect_language(all_text)
+        return language
+    except LangDetectException as e:
+        log.debug(interpret_error(e))
+        return TOO_LITTLE_DATA
+
+
+def index_file(db: StringIndexDb, file_path, file_states: dict, stats: dict):
+    """
+    Reindexes the file if it changed since it was indexed.
+
+    Args:
+        file_states: Indexed file states from the db. State of the file is popped,
+            so states of files, which weren't visited, are left.
+        stats: Counters of added, updated, unchanged and failed files.
+    """
+    path = normalize_index_path(file_path)
+    file_stat = os.stat(file_path)
+
+    indexed_state = file_states.pop(path, None)
+    if indexed_state is not None and indexed_state[1:] == (file_stat.st_mtime, file_stat.st_size):
+        stats["unchanged"] += 1
+        return
+
+    with open(file_path, 'rb') as f:
+        encoding = detect_file_encoding(f.read())
+
+    strings = []
+    texts = []
+    try:
+        for string_id, text, line in iter_strings(file_path):
+            if string_id is None:
+                log.warning(trn("String without id in file: '%s', line: %s. Not indexed") % (file_path, line))
+                continue
+            text = (text or "").strip()
+            strings.append((string_id, line, hash_text(text), purify_text(text) if text else ""))
+            if text:
+                texts.append(text)
+    except Exception as e:
+        # File is still indexed (without strings), so it's not reparsed until it's changed
+        log.error(trn("Can't index strings of file: '%s'. Error: %s") % (file_path, interpret_error(e)))
+        strings = []
+
+    try:
+        db.replace_file(path, file_stat.st_mtime, file_stat.st_size, detect_file_language(texts), encoding, strings)
+    except sqlite3.Error as e:
+        # Changes of the file are rolled back, other files are still indexed
+        log.error(trn("Can't save file to the index: '%s'. Error: %s") % (file_path, interpret_error(e)))
+        stats["failed"] += 1
+        return
+    stats["updated" if indexed_state is not None else "added"] += 1
+
+
+class IndexBuild(AbstractCommand):
+    # Metadata
+    ##########
+    def get_name(self) -> str:
+        return "build"
+
+    def get_aliases(self) -> list:
+        return ['b']
+
+    def _get_help(self) -> str:
+        return trn('Build (or update) index of string ids. Only files changed since the last build are reindexed')
+
+    def _setup_parser_args(self, parser):
+        parser.add_argument('paths', nargs='*', help=trn('Paths to files or directories'))
+        parser.add_argument('--db', default=DEFAULT_INDEX_PATH, help=trn('Path to the index database'))
+
+    # Execution
+    ###########
+    def _process_file(self, file_path, results: dict, args):
+        # Files left in the states after the build weren't found
+        index_file(results["db"], file_path, results["file_states"], results["stats"])
+
+    def execute(self, args) -> dict:
+        files = get_xml_files_and_log(args.paths, trn("Indexing"))
+
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        with StringIndexDb(args.db) as db:
+            results = {"db": db, "stats": stats, "file_states": db.get_file_states()}
+            self.process_files_with_progressbar(args, files, results, True)
+
+            for path, (file_id, _, _) in results["file_states"].items():
+                if not os.path.exists(path):
+                    log.info(trn("File '%s' doesn't exist anymore. Removing from the index") % path)
+                    db.remove_file(file_id)
+                    stats["removed"] += 1
+
+        return {"db_path": args.db, "stats": stats}
+
+    # Displaying
+    ############
+    def display_result(self, result: dict):
+        stats = result["stats"]
+        log.always(trn("Index [cyan]%s[/cyan] is up to date") % result["db_path"])
+        log.always(trn("Files added: %s, updated: %s, unchanged: %s, removed: %s, failed: %s")
+                   % (cf_green(stats["added"]), cf_yellow(stats["updated"]), cf_cyan(stats["unchanged"]),
+                      cf_yellow(stats["removed"]), cf_red(stats["failed"])))
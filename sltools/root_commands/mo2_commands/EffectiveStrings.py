@@ -0,0 +1,276 @@
+import json
+import os
+from datetime import datetime
+
+from rich import get_console
+
+from sltools.baseline.command_baseline import AbstractCommand
+from sltools.log_config_loader import log
+from sltools.root_commands.index_commands.IndexBuild import index_file
+from sltools.utils.colorize import cf_green, cf_yellow, cf_red, cf_cyan
+from sltools.utils.index_utils import StringIndexDb, DEFAULT_INDEX_PATH, normalize_index_path
+from sltools.utils.lang_utils import trn
+from sltools.utils.misc import create_table
+
+BASE_GAME_SOURCE = 'gamedata'
+DEFAULT_LANGUAGE = 'rus'
+
+# Statuses of string definitions
+WINNING = 'winning'
+# Loaded, but the id is defined again by a file loaded later
+OVERRIDDEN = 'overridden'
+# File is replaced by the same file of a mod with higher priority, but the id is defined elsewhere
+SHADOWED = 'shadowed'
+# File is replaced by the same file of a mod with higher priority, and the id isn't defined anywhere else
+DEAD = 'dead'
+STATUSES = [WINNING, OVERRIDDEN, SHADOWED, DEAD]
+
+
+class StringDefinition:
+    __slots__ = ('string_id', 'source', 'vfs_path', 'line', 'text_hash', 'status', 'winner')
+
+    def __init__(self, string_id, source, vfs_path, line, text_hash, status):
+        self.string_id = string_id
+        self.source = source
+        self.vfs_path = vfs_path
+        self.line = line
+        self.text_hash = text_hash
+        self.status = status
+        self.winner = None
+
+
+def read_modlist(modlist_path):
+    """
+    MO2 lists mods from the highest priority to the lowest one. Disabled mods ('-'),
+    unmanaged entries ('*') and separators are skipped.
+
+    Returns:
+        list: Names of enabled mods from the lowest priority to the highest one.
+    """
+    mods = []
+    with open(modlist_path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith('+') or line.endswith('_separator'):
+                continue
+            mods.append(line[1:])
+    return mods[::-1]
+
+
+def find_text_files(gamedata_dir, language):
+    """
+    Returns:
+        dict: VFS path (relative to gamedata, lowercase as file names are case-insensitive in game) -> real path
+            of string table files of the language.
+    """
+    text_files = {}
+    text_dir = os.path.join(gamedata_dir, 'configs', 'text', language)
+    for root, _, file_names in os.walk(text_dir):
+        for file_name in file_names:
+            if file_name.lower().endswith('.xml'):
+                real_path = os.path.join(root, file_name)
+                vfs_path = os.path.relpath(real_path, gamedata_dir).replace(os.sep, '/').lower()
+                text_files[vfs_path] = real_path
+    return text_files
+
+
+def resolve_load_order(sources, language):
+    """
+    Args:
+        sources: (source name, gamedata dir) from the lowest priority to the highest one.
+
+    Returns:
+        tuple: (loaded, shadowed) lists of (vfs path, source name, real path). Loaded files are in the order
+            game loads them (alphabetical), shadowed files are replaced by the same file of a source with higher priority.
+    """
+    winners = {}
+    shadowed = []
+    for source, gamedata_dir in sources:
+        for vfs_path, real_path in find_text_files(gamedata_dir, language).items():
+            if vfs_path in winners:
+                shadowed.append(winners[vfs_path])
+            winners[vfs_path] = (vfs_path, source, real_path)
+    return [winners[vfs_path] for vfs_path in sorted(winners)], shadowed
+
+
+def read_real_paths_file(real_paths_file, mo2_base_dir, language, gamedata_dir=None):
+    """
+    Reads output of 'vfs-map'. It has only files of mods winning in VFS already, so files of the base game
+    (with the lowest priority) are the only ones that can be shadowed.
+
+    Returns:
+        tuple: (loaded, shadowed) as resolve_load_order does.
+    """
+    text_dir_prefix = 'configs/text/%s/' % language.lower()
+    winners = {}
+    with open(real_paths_file, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            # Lines look like '.\mods\<mod>\gamedata\configs\text\...'
+            parts = [part for part in line.strip().replace('\\', '/').split('/') if part not in ('', '.')]
+            if len(parts) < 4 or parts[0] != 'mods' or parts[2].lower() != 'gamedata':
+                log.warning(trn("Line %s of '%s' isn't a path to gamedata of a mod: '%s'. Skipped")
+                            % (line_number, real_paths_file, line.strip()))
+                continue
+            vfs_path = '/'.join(parts[3:]).lower()
+            if vfs_path.startswith(text_dir_prefix) and vfs_path.endswith('.xml'):
+                winners[vfs_path] = (vfs_path, parts[1], os.path.join(mo2_base_dir, *parts))
+
+    shadowed = []
+    if gamedata_dir:
+        for vfs_path, real_path in find_text_files(gamedata_dir, language).items():
+            if vfs_path in winners:
+                shadowed.append((vfs_path, BASE_GAME_SOURCE, real_path))
+            else:
+                winners[vfs_path] = (vfs_path, BASE_GAME_SOURCE, real_path)
+    return [winners[vfs_path] for vfs_path in sorted(winners)], shadowed
+
+
+def build_effective_table(loaded, shadowed, strings_by_path):
+    """
+    Game loads string tables one by one, and a definition of an id replaces the one loaded before.
+
+    Args:
+        strings_by_path: Real path -> (string id, line, text hash) in document order.
+
+    Returns:
+        tuple: (id -> winning definition, all definitions in load order followed by shadowed ones).
+    """
+    winners = {}
+    definitions = []
+    for vfs_path, source, real_path in loaded:
+        for string_id, line, text_hash in strings_by_path.get(real_path, ()):
+            previous = winners.get(string_id)
+            if previous is not None:
+                previous.status = OVERRIDDEN
+            winners[string_id] = StringDefinition(string_id, source, vfs_path, line, text_hash, WINNING)
+            definitions.append(winners[string_id])
+
+    for vfs_path, source, real_path in shadowed:
+        for string_id, line, text_hash in strings_by_path.get(real_path, ()):
+            status = SHADOWED if string_id in winners else DEAD
+            definitions.append(StringDefinition(string_id, source, vfs_path, line, text_hash, status))
+
+    for definition in definitions:
+        if definition.status != WINNING:
+            definition.winner = winners.get(definition.string_id)
+    return winners, definitions
+
+
+class EffectiveStrings(AbstractCommand):
+    # Metadata
+    ##########
+    def get_name(self) -> str:
+        return "effective-strings"
+
+    def get_aliases(self) -> list:
+        return ['es']
+
+    def _get_help(self) -> str:
+        return trn('Resolve which definition of each string id wins under MO2 load order. '
+                   'Reports overridden, shadowed and dead definitions')
+
+    def _setup_parser_args(self, parser):
+        parser.add_argument('--mo2-base-dir', required=True, dest="mo2_base_dir",
+                            help=trn('Path to the base directory of Mod Organizer 2'))
+        order = parser.add_mutually_exclusive_group(required=True)
+        order.add_argument('--modlist',
+                           help=trn('Path to modlist.txt of MO2 profile (mods on top have higher priority)'))
+        order.add_argument('--real-paths-file', dest="real_paths_file",
+                           help=trn('Path to the file with real paths of the VFS (output from vfs-map command)'))
+        parser.add_argument('--gamedata',
+                            help=trn('Path to gamedata of the base game (loaded before all mods)'))
+        parser.add_argument('--language', default=DEFAULT_LANGUAGE,
+                            help=trn('Language of string tables (directory in configs/text)'))
+        parser.add_argument('--status', choices=STATUSES, action='append',
+                            help=trn('Show definitions with the status (can be repeated). Default: all but winning'))
+        parser.add_argument('--id', dest='string_id', help=trn('Show definitions of the string id only'))
+        parser.add_argument('--limit', type=int, default=50, help=trn('Show only first N definitions (0 for all)'))
+        parser.add_argument('--save-report', action='store_true', default=False,
+                            help=trn('Save effective string table and definitions as JSON'))
+        parser.add_argument('--db', default=DEFAULT_INDEX_PATH,
+                            help=trn('Path to the index database (strings of unchanged files are taken from it)'))
+
+    # Execution
+    ###########
+    def _process_file(self, file_path, results: dict, args):
+        index_file(results["db"], file_path, results["file_states"], results["stats"])
+
+    def get_sources(self, args):
+        sources = []
+        if args.gamedata:
+            sources.append((BASE_GAME_SOURCE, args.gamedata))
+        for mod in read_modlist(args.modlist):
+            sources.append((mod, os.path.join(args.mo2_base_dir, 'mods', mod, 'gamedata')))
+        return sources
+
+    def execute(self, args) -> dict:
+        if args.modlist:
+            loaded, shadowed = resolve_load_order(self.get_sources(args), args.language)
+        else:
+            loaded, shadowed = read_real_paths_file(args.real_paths_file, args.mo2_base_dir, args.language,
+                                                    args.gamedata)
+        log.always(trn("String tables loaded: %s, shadowed by mods with higher priority: %s")
+                   % (cf_green(len(loaded)), cf_yellow(len(shadowed))))
+
+        # Only files changed since the previous run are parsed
+        real_paths = [real_path for _, _, real_path in loaded + shadowed]
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "failed": 0}
+        strings_by_path = {}
+        with StringIndexDb(args.db) as db:
+            results = {"db": db, "stats": stats, "file_states": db.get_file_states()}
+            self.process_files_with_progressbar(args, real_paths, results, True)
+            for real_path in real_paths:
+                strings_by_path[real_path] = [(string_id, line, text_hash) for string_id, _, line, _, _, text_hash
+                                              in db.find_by_file(normalize_index_path(real_path))]
+        log.info(trn("Files reindexed: %s, unchanged: %s, failed: %s")
+                 % (stats["added"] + stats["updated"], stats["unchanged"], stats["failed"]))
+
+        winners, definitions = build_effective_table(loaded, shadowed, strings_by_path)
+
+        if args.save_report:
+            timestamp = datetime.now()
+            with open(trn("effective-strings-report-%s.json") % timestamp, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "effective": {string_id: {"source": d.source, "file": d.vfs_path, "line": d.line}
+                                  for string_id, d in winners.items()},
+                    "definitions": [{"id": d.string_id, "status": d.status, "source": d.source, "file": d.vfs_path,
+                                     "line": d.line, "winning_source": d.winner.source if d.winner else None}
+                                    for d in definitions if d.status != WINNING]
+                }, f, ensure_ascii=False, indent=4)
+
+        return {"winners": winners, "definitions": definitions, "statuses": args.status, "string_id": args.string_id,
+                "limit": args.limit}
+
+    # Displaying
+    ############
+    def display_result(self, result: dict):
+        definitions = result["definitions"]
+        statuses = result["statuses"] or [OVERRIDDEN, SHADOWED, DEAD]
+        if result["string_id"] is not None:
+            shown = [d for d in definitions if d.string_id == result["string_id"]]
+        else:
+            shown = [d for d in definitions if d.status in statuses]
+
+        limit = result["limit"]
+        status_colors = {WINNING: cf_green, OVERRIDDEN: cf_yellow, SHADOWED: cf_cyan, DEAD: cf_red}
+        if len(shown) > 0:
+            table = create_table([trn("String id"), trn("Status"), trn("Source"), trn("File"), trn("Line"),
+                                  trn("Winning source"), trn("Same text")])
+            for d in shown if limit <= 0 else shown[:limit]:
+                winner = d.winner
+                table.add_row(d.string_id, status_colors[d.status](d.status), d.source, d.vfs_path, str(d.line),
+                              winner.source if winner else "-",
+                              trn("Yes") if winner and winner.text_hash == d.text_hash else "-")
+            get_console().print(table)
+            if 0 < limit < len(shown):
+                log.always(trn("Shown %d of %d definitions. Use --limit to see more") % (limit, len(shown)))
+
+        counts = {status: 0 for status in STATUSES}
+        for d in definitions:
+            counts[d.status] += 1
+        log.always(trn("Effective string ids: %s") % cf_green(len(result["winners"])))
+        log.always(trn("Definitions: winning %s, overridden %s, shadowed %s, dead %s")
+                   % (cf_green(counts[WINNING]), cf_yellow(counts[OVERRIDDEN]), cf_cyan(counts[SHADOWED]),
+                      cf_red(counts[DEAD])))
@@ -25,12 +25,17 @@ from sltools.root_commands.Config import Config
 from sltools.root_commands.FindStringDuplicates import FindStringDuplicates
 from sltools.root_commands.FixEncoding import FixEncoding
 from sltools.root_commands.FormatXml import FormatXml
+from sltools.root_commands.IndexCommandProcessor import IndexCommandProcessor
 from sltools.root_commands.MO2CommandProcessor import MO2CommandProcessor
 from sltools.root_commands.Misc import Misc
+from sltools.root_commands.Query import Query
+from sltools.root_commands.Search import Search
 from sltools.root_commands.SortFilesWithDuplicates import SortFilesWithDuplicates
 from sltools.root_commands.Translate import Translate
 from sltools.root_commands.ValidateEncoding import ValidateEncoding
 from sltools.root_commands.ValidateXml import ValidateXml
+from sltools.root_commands.index_commands.IndexBuild import IndexBuild
+from sltools.root_commands.mo2_commands.EffectiveStrings import EffectiveStrings
 from sltools.root_commands.mo2_commands.VfsCopy import VfsCopy
 from sltools.root_commands.mo2_commands.VfsMap import VfsMap
 from sltools.utils.colorize import *
@@ -58,7 +63,13 @@ def main():
             MO2CommandProcessor([
                 VfsMap(),
                 VfsCopy(),
+                EffectiveStrings(),
             ]),
+            IndexCommandProcessor([
+                IndexBuild(),
+            ]),
+            Query(),
+            Search(),
             Misc(),
         ])
         root.setup(parser)
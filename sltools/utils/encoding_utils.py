@@ -43,3 +43,114 @@ def is_file_content_win1251_compatible(binary_text, encoding):
         return False, cf_yellow("Suspicious")
     else:
         return False, cf_red("Not decodable")
+
+
+# Per-line (mixed) encoding detection
+ASCII_ENCODING = 'ascii'
+UTF8_ENCODING = 'utf-8'
+UNKNOWN_ENCODING = 'unknown'
+MIXED_ENCODING = 'mixed'
+# Line is valid in both UTF-8 and windows-1251, and there is too little evidence to choose
+AMBIGUOUS_ENCODING = 'ambiguous'
+
+# Short windows-1251 lines often happen to be valid UTF-8 ('Рі' -> 'г'), so a line is classified as UTF-8
+# only when it has at least this many characters expected in UTF-8 text (or isn't valid windows-1251)
+UTF8_MIN_EVIDENCE = 3
+# Non-ASCII punctuation common in localization texts
+UTF8_EXPECTED_PUNCTUATION = set('\u00a0«»°–—‘’‚“”„…№')
+
+
+def is_expected_utf8_char(char):
+    # Modern Cyrillic letters (incl. Ukrainian and Belarusian). Archaic ones, as well as Greek, Latin-1 symbols etc.
+    # are what windows-1251 byte pairs decode to, e.g. 'Сі' -> 'ѳ', 'Ні' -> 'ͳ'
+    return '\u0400' <= char <= '\u045f' or char in '\u0490\u0491' or char in UTF8_EXPECTED_PUNCTUATION
+
+
+def decode_or_none(binary_text, encoding):
+    try:
+        return binary_text.decode(encoding)
+    except UnicodeDecodeError:
+        return None
+
+
+def classify_line_encoding(binary_line):
+    if binary_line.isascii():
+        return ASCII_ENCODING
+
+    text = decode_or_none(binary_line, UTF8_ENCODING)
+    is_primary_decodable = decode_or_none(binary_line, PRIMARY_ENCODING) is not None
+    if text is not None:
+        if not is_primary_decodable:
+            return UTF8_ENCODING
+
+        non_ascii_chars = [char for char in text if not char.isascii()]
+        if all(is_expected_utf8_char(char) for char in non_ascii_chars):
+            return UTF8_ENCODING if len(non_ascii_chars) >= UTF8_MIN_EVIDENCE else AMBIGUOUS_ENCODING
+
+    return PRIMARY_ENCODING if is_primary_decodable else UNKNOWN_ENCODING
+
+
+def classify_encoding_segments(binary_text):
+    """
+    Splits binary text into segments of consecutive lines sharing the same encoding in one pass.
+    ASCII lines are compatible with any encoding, so they're attached to the segment they're in.
+    Ambiguous lines are valid in both encodings, so they take the encoding of the segment they're in too.
+    Text is mixed only if lines with enough evidence of both encodings are found. If no line has enough
+    evidence, the text is considered windows-1251.
+
+    Returns:
+        list: Tuples of (encoding, first_line, last_line), lines are 1-indexed and inclusive.
+    """
+    segments = []
+    for line_number, binary_line in enumerate(binary_text.split(b'\n'), start=1):
+        encoding = classify_line_encoding(binary_line)
+        if len(segments) == 0:
+            segments.append([encoding, line_number, line_number])
+            continue
+
+        last_segment = segments[-1]
+        if encoding == last_segment[0] or encoding == ASCII_ENCODING:
+            last_segment[2] = line_number
+        elif encoding == AMBIGUOUS_ENCODING:
+            if last_segment[0] == ASCII_ENCODING:
+                last_segment[0] = AMBIGUOUS_ENCODING
+            last_segment[2] = line_number
+        elif last_segment[0] in (ASCII_ENCODING, AMBIGUOUS_ENCODING):
+            # Leading ASCII and ambiguous lines belong to the first segment with known encoding
+            last_segment[0] = encoding
+            last_segment[2] = line_number
+        else:
+            segments.append([encoding, line_number, line_number])
+
+    if len(segments) == 1 and segments[0][0] == AMBIGUOUS_ENCODING:
+        segments[0][0] = PRIMARY_ENCODING
+
+    return [tuple(segment) for segment in segments]
+
+
+def is_mixed_encoding(segments):
+    return len({encoding for encoding, _, _ in segments if encoding != ASCII_ENCODING}) > 1
+
+
+def describe_encoding_segments(segments):
+    return ", ".join("%s: %d-%d" % (encoding, first, last) for encoding, first, last in segments)
+
+
+def normalize_segments_to_primary_encoding(binary_text, segments):
+    """
+    Re-encodes every segment from its own encoding to windows-1251.
+    Raises UnicodeDecodeError/UnicodeEncodeError with the failed segment attached as 'segment' attribute.
+    """
+    binary_lines = binary_text.split(b'\n')
+    normalized_segments = []
+    for segment in segments:
+        encoding, first_line, last_line = segment
+        binary_segment = b'\n'.join(binary_lines[first_line - 1:last_line])
+        source_encoding = PRIMARY_ENCODING if encoding == UNKNOWN_ENCODING else encoding
+        try:
+            normalized_segments.append(binary_segment.decode(source_encoding).encode(PRIMARY_ENCODING))
+        except (UnicodeDecodeError, UnicodeEncodeError) as e:
+            e.segment = segment
+            raise e
+
+    return b'\n'.join(normalized_segments)
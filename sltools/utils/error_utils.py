@@ -2,6 +2,7 @@ import re
 
 from sltools.log_config_loader import log
 from sltools.utils.lang_utils import trn
+from sltools.utils.plain_text_utils import LineIndex
 
 failed_files = {}
 
@@ -44,24 +45,18 @@ def display_encoding_error_details(xml_str, error_str):
     position = int(match.group(1))
 
     # Calculate row and column
-    lines = xml_str.split('\n')
-    row, col, char_count = 0, 0, 0
-    for i, line in enumerate(lines):
-        char_count += len(line) + 1  # +1 for the newline character
-        if char_count > position:
-            row = i + 1  # 1-indexed row number
-            col = len(line) - (char_count - position) + 1  # 1-indexed column number
-            break
+    line_index = LineIndex(xml_str)
+    row, col = line_index.position(min(position, len(xml_str)))
 
     # Print details
     log.error(trn("Illegal character! Error at row %s, column %s:") % (row, col))
-    snippet_start = max(0, row - 3)  # Show up to 2 lines before the error
-    snippet_end = min(len(lines), row + 2)  # Show up to 2 lines after the error
-    for i in range(snippet_start, snippet_end):
-        msg = f"{i + 1}: {lines[i]}"
+    snippet_start = max(1, row - 2)  # Show up to 2 lines before the error
+    snippet_end = min(line_index.line_count(), row + 2)  # Show up to 2 lines after the error
+    for i in range(snippet_start, snippet_end + 1):
+        msg = f"{i}: {line_index.line(i)}"
         log.error(trn("[default]%s[/default]") % msg)
-        if i == row - 1:
-            log.error(' ' * (col + len(f"{i + 1}: ") - 1) + '-^-')  # Print a caret under the error column
+        if i == row:
+            log.error(' ' * (col + len(f"{i}: ") - 1) + '-^-')  # Print a caret under the error column
 
 
 # Interpret and translate errors
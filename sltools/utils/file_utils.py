@@ -1,5 +1,6 @@
 import codecs
 import glob
+import json
 import os
 
 from sltools.baseline.config import PRIMARY_ENCODING
@@ -34,3 +35,98 @@ def save_xml(file_path, xml_string, encoding=PRIMARY_ENCODING):
 
     with codecs.open(file_path, 'w', encoding=encoding) as file:
         return file.write(xml_string)
+
+
+class JsonStreamReader:
+    """
+    Reads a JSON document piece by piece, so only the currently decoded value is kept in memory
+    """
+
+    def __init__(self, file, chunk_size=64 * 1024):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self):
+        # Read at least as much as is buffered, so decoding of a big value isn't retried too many times
+        chunk = self.file.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos] if self.pos < len(self.buffer) else ''
+            self._read_more()
+
+    def consume(self, char):
+        """Consumes the char (skipping whitespaces) if it's the next one"""
+        if self._peek() != char:
+            return False
+        self.pos += 1
+        return True
+
+    def expect(self, char):
+        if not self.consume(char):
+            raise ValueError(trn("Malformed JSON: expected '%s' but got '%s'") % (char, self._peek()))
+
+    def decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may be cut (e.g. '1.5e' + '10')
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in '0123456789+-.eE'):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read_more()
+
+    def iter_object(self):
+        """Yields (key, reader) for each member of the object. Value of each member must be read before the next one"""
+        self.expect('{')
+        if self.consume('}'):
+            return
+        while True:
+            key = self.decode()
+            self.expect(':')
+            yield key, self
+            if not self.consume(','):
+                break
+        self.expect('}')
+
+
+def iter_json_object_items(file_path, key):
+    """
+    Streams (name, value) members of the object stored under the top-level 'key' of the JSON file,
+    so the file is never loaded as a whole.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        reader = JsonStreamReader(file)
+        for top_level_key, _ in reader.iter_object():
+            if top_level_key != key:
+                reader.decode()
+                continue
+
+            for name, _ in reader.iter_object():
+                yield name, reader.decode()
+
+
+def read_json_member(file_path, key):
+    """Decodes only the top-level 'key' of the JSON file"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        reader = JsonStreamReader(file)
+        for top_level_key, _ in reader.iter_object():
+            value = reader.decode()
+            if top_level_key == key:
+                return value
+    return None
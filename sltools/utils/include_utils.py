@@ -0,0 +1,109 @@
+import errno
+import os
+import re
+
+from sltools.config_file_manager import file_config
+from sltools.log_config_loader import log
+from sltools.utils.file_utils import read_xml
+from sltools.utils.lang_utils import trn
+
+include_pattern = re.compile(r'#include\s*"(.*?)"')
+
+
+class IncludeNotFoundError(FileNotFoundError):
+    def __init__(self, include_path, includer_path, line):
+        super().__init__(errno.ENOENT, os.strerror(errno.ENOENT), include_path)
+        self.includer_path = includer_path
+        self.line = line
+
+
+class IncludeCycleError(Exception):
+    def __init__(self, chain):
+        super().__init__(trn("Cyclic #include: %s") % " -> ".join(chain))
+        self.chain = chain
+
+
+class IncludeResolver:
+    """
+    Resolves C-style '#include "path"' macros (recursively) against configured roots.
+
+    Included files are read and expanded only once per path, so the include graph of
+    the whole corpus is built just once no matter how many files include the same file.
+    """
+
+    def __init__(self, roots):
+        self.roots = roots
+        # Resolved path -> (lines, origins) of fully expanded file content
+        self._expanded_cache = {}
+        # Resolved path -> list of resolved paths it includes
+        self.include_graph = {}
+
+    def find_included_file(self, include_path):
+        include_path = include_path.replace("\\", "/")
+        for root in self.roots:
+            candidate = os.path.normpath(os.path.join(root, include_path))
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def resolve(self, xml_string, file_path):
+        """
+        Returns:
+            tuple: Document with all includes expanded, and list of (file_path, line) origins of each of its lines.
+        """
+        trailing = "\n" if xml_string[-1] == "\n" else ""
+        lines, origins = self._expand(xml_string.splitlines(), file_path, [os.path.normpath(file_path)])
+        return '\n'.join(lines) + trailing, origins
+
+    def _expand(self, lines, file_path, include_chain):
+        expanded_lines = []
+        origins = []
+        includes = []
+        for line_number, line in enumerate(lines, start=1):
+            match = include_pattern.search(line) if line.strip().startswith('#include') else None
+            if match is None:
+                expanded_lines.append(line)
+                origins.append((file_path, line_number))
+                continue
+
+            included_path = self.find_included_file(match.group(1))
+            if included_path is None:
+                raise IncludeNotFoundError(match.group(1), file_path, line_number)
+            if included_path in include_chain:
+                raise IncludeCycleError(include_chain + [included_path])
+
+            included_lines, included_origins = self._get_expanded_file(included_path, include_chain + [included_path])
+            expanded_lines.extend(included_lines)
+            origins.extend(included_origins)
+            includes.append(included_path)
+
+        self.include_graph[os.path.normpath(file_path)] = includes
+        return expanded_lines, origins
+
+    def _get_expanded_file(self, included_path, include_chain):
+        if included_path not in self._expanded_cache:
+            log.debug(trn("Reading included file: %s") % included_path)
+            # Content is inserted as is, so trailing newline becomes an empty line
+            self._expanded_cache[included_path] = self._expand(read_xml(included_path).split('\n'), included_path, include_chain)
+        return self._expanded_cache[included_path]
+
+    @staticmethod
+    def map_line(origins, line):
+        """Maps line of the resolved document back to (file_path, line) it came from"""
+        if line is None or not 0 < line <= len(origins):
+            return None
+        return origins[line - 1]
+
+
+def get_include_roots():
+    return [root for root in file_config.xml.include_roots.split("|") if root]
+
+
+_include_resolver = None
+
+
+def get_include_resolver():
+    global _include_resolver
+    if _include_resolver is None:
+        _include_resolver = IncludeResolver(get_include_roots())
+    return _include_resolver
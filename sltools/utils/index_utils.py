@@ -0,0 +1,178 @@
+import hashlib
+import os
+import sqlite3
+
+from sltools.log_config_loader import log
+from sltools.utils.lang_utils import trn
+
+DEFAULT_INDEX_PATH = 'sltools-index.db'
+# Index is rebuilt from scratch if it was created by other version of the schema
+INDEX_SCHEMA_VERSION = 2
+
+SCHEMA = '''
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    language TEXT,
+    encoding TEXT
+);
+CREATE TABLE strings (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    string_id TEXT NOT NULL,
+    line INTEGER,
+    text_hash TEXT
+);
+CREATE INDEX strings_by_id ON strings(string_id);
+CREATE INDEX strings_by_file ON strings(file_id);
+'''
+# Trigram index of purified texts (rowid is the one of the string). Needs SQLite 3.34+
+TEXT_INDEX_SCHEMA = '''
+CREATE VIRTUAL TABLE texts USING fts5(text, tokenize='trigram');
+CREATE TRIGGER strings_text_delete AFTER DELETE ON strings BEGIN
+    DELETE FROM texts WHERE rowid = old.rowid;
+END;
+'''
+STRING_ROW_QUERY = '''
+SELECT strings.string_id, files.path, strings.line, files.language, files.encoding, strings.text_hash
+FROM strings JOIN files ON files.id = strings.file_id
+'''
+
+
+class IndexNotFoundError(FileNotFoundError):
+    def __init__(self, db_path):
+        super().__init__(trn("Index '%s' not found. Build it with 'slt index build' first") % db_path)
+
+
+class IndexVersionError(ValueError):
+    def __init__(self, db_path):
+        super().__init__(trn("Index '%s' was built by other version of the tool. Rebuild it with 'slt index build'")
+                         % db_path)
+
+
+def hash_text(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def normalize_index_path(file_path):
+    return os.path.normpath(os.path.abspath(file_path))
+
+
+class StringIndexDb:
+    """
+    SQLite index of string definitions: which file (and line) defines which id.
+    Files are stored with their mtime and size, so the index is updated only for changed files.
+    """
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH, create=True):
+        if not create and not os.path.isfile(db_path):
+            raise IndexNotFoundError(db_path)
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self._ensure_schema(create)
+
+    def _ensure_schema(self, create):
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version != INDEX_SCHEMA_VERSION:
+            if not create:
+                # Readers don't touch the index, it's rebuilt by 'index build' only
+                self.connection.close()
+                raise IndexVersionError(self.db_path)
+            if version != 0:
+                # Index is just a cache of the files, so it's simply built anew
+                log.info(trn("Index '%s' was built by other version of the tool. Rebuilding") % self.db_path)
+                self.connection.close()
+                os.remove(self.db_path)
+                self.connection = sqlite3.connect(self.db_path)
+                self.connection.execute('PRAGMA foreign_keys = ON')
+
+            self.connection.executescript(SCHEMA)
+            try:
+                self.connection.executescript(TEXT_INDEX_SCHEMA)
+            except sqlite3.OperationalError as e:
+                log.warning(trn("Text search isn't supported by SQLite %s (3.34+ is needed): %s") % (sqlite3.sqlite_version, e))
+            self.connection.execute('PRAGMA user_version = %d' % INDEX_SCHEMA_VERSION)
+            self.connection.commit()
+
+        self.has_text_index = self.connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'texts'").fetchone()[0] > 0
+
+    def get_file_states(self):
+        """
+        Returns:
+            dict: File path -> (file id, mtime, size) of indexed files.
+        """
+        rows = self.connection.execute('SELECT path, id, mtime, size FROM files')
+        return {path: (file_id, mtime, size) for path, file_id, mtime, size in rows}
+
+    def replace_file(self, file_path, mtime, size, language, encoding, strings):
+        """
+        Args:
+            strings: Iterable of (string id, line, text hash, purified text) of the file.
+        """
+        # File is replaced as a whole or not at all
+        self.connection.execute('SAVEPOINT replace_file')
+        try:
+            self.connection.execute('DELETE FROM files WHERE path = ?', (file_path,))
+            cursor = self.connection.execute('INSERT INTO files (path, mtime, size, language, encoding) VALUES (?, ?, ?, ?, ?)',
+                                             (file_path, mtime, size, language, encoding))
+            file_id = cursor.lastrowid
+            for string_id, line, text_hash, text in strings:
+                cursor = self.connection.execute('INSERT INTO strings (file_id, string_id, line, text_hash) VALUES (?, ?, ?, ?)',
+                                                 (file_id, string_id, line, text_hash))
+                if self.has_text_index and text:
+                    self.connection.execute('INSERT INTO texts (rowid, text) VALUES (?, ?)', (cursor.lastrowid, text))
+        except sqlite3.Error:
+            self.connection.execute('ROLLBACK TO replace_file')
+            self.connection.execute('RELEASE replace_file')
+            raise
+        self.connection.execute('RELEASE replace_file')
+        return file_id
+
+    def remove_file(self, file_id):
+        self.connection.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    # Queries. Rows are (string id, file path, line, language, encoding, text hash)
+    def find_by_id(self, string_id):
+        return self.connection.execute(STRING_ROW_QUERY + 'WHERE strings.string_id = ? ORDER BY files.path, strings.line',
+                                       (string_id,)).fetchall()
+
+    def find_by_prefix(self, prefix):
+        # Range scan uses the index of ids (unlike LIKE, which is case-insensitive and treats '_' as wildcard)
+        return self.connection.execute(STRING_ROW_QUERY + 'WHERE strings.string_id >= ? AND strings.string_id < ? '
+                                                          'ORDER BY strings.string_id, files.path, strings.line',
+                                       (prefix, prefix + '\U0010ffff')).fetchall()
+
+    def find_by_file(self, file_path):
+        return self.connection.execute(STRING_ROW_QUERY + 'WHERE files.path = ? ORDER BY strings.line',
+                                       (normalize_index_path(file_path),)).fetchall()
+
+    def iter_texts(self, fts_query=None):
+        """
+        Yields:
+            tuple: (string id, file path, line, purified text) of texts matching the FTS5 query (or all texts).
+        """
+        if not self.has_text_index:
+            raise ValueError(trn("Index '%s' has no text index (SQLite 3.34+ is needed)") % self.db_path)
+
+        query = ('SELECT strings.string_id, files.path, strings.line, texts.text FROM texts '
+                 'JOIN strings ON strings.rowid = texts.rowid JOIN files ON files.id = strings.file_id')
+        if fts_query is None:
+            return self.connection.execute(query)
+        return self.connection.execute(query + ' WHERE texts MATCH ?', (fts_query,))
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        self.close()
@@ -0,0 +1,65 @@
+import sys
+
+from sltools.utils.report_utils import NameTable
+
+
+class StringOccurrence:
+    __slots__ = ('string_id', 'file_index', 'line', 'text')
+
+    def __init__(self, string_id, file_index, line, text):
+        self.string_id = string_id
+        self.file_index = file_index
+        self.line = line
+        self.text = text
+
+
+class StringOccurrences:
+    """
+    Occurrences of string ids in the analysed files. File paths are interned to indices and ids
+    are interned strings, so each of them is stored once no matter how many occurrences refer to it.
+    Occurrences are shared by both lookups: by id and by file (in document order).
+    """
+
+    def __init__(self):
+        self.files = NameTable()
+        self.by_id = {}
+        self.by_file = []
+
+    def add_file(self, file_path):
+        file_index = self.files.intern(file_path)
+        if file_index == len(self.by_file):
+            self.by_file.append([])
+        return file_index
+
+    def add(self, file_index, string_id, line, text):
+        """
+        Returns:
+            StringOccurrence: Added occurrence.
+        """
+        string_id = sys.intern(string_id)
+        occurrence = StringOccurrence(string_id, file_index, line, text)
+        self.by_id.setdefault(string_id, []).append(occurrence)
+        self.by_file[file_index].append(occurrence)
+        return occurrence
+
+    def file_path(self, file_index):
+        return self.files.name(file_index)
+
+    def file_paths(self):
+        return self.files.names
+
+    def items(self):
+        """Yields (string id, occurrences) in the order ids were first seen"""
+        return self.by_id.items()
+
+    def file_occurrences(self, file_index):
+        return self.by_file[file_index]
+
+    def memory_footprint(self):
+        size = sys.getsizeof(self.by_id) + sys.getsizeof(self.by_file)
+        for occurrences in self.by_id.values():
+            size += sys.getsizeof(occurrences) + sum(sys.getsizeof(o) for o in occurrences)
+        return size + sum(sys.getsizeof(occurrences) for occurrences in self.by_file)
+
+    def __len__(self):
+        return len(self.by_id)
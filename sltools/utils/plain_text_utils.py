@@ -1,10 +1,12 @@
 import re
 import textwrap
-from collections import Counter
+from bisect import bisect_right
+from itertools import accumulate
 
 from colorama import Fore
 
 from sltools.baseline.config import text_wrap_width
+from sltools.config_file_manager import file_config
 from sltools.log_config_loader import log
 from sltools.utils.colorize import rich_guard
 from sltools.utils.lang_utils import trn
@@ -12,6 +14,81 @@ from sltools.utils.lang_utils import trn
 tabwidth = "    "
 
 
+class LineIndex:
+    """
+    Offsets of line starts of the document, built once so offset <-> line lookups
+    take O(log n) instead of rescanning the document each time. Rows are 1-indexed.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.line_starts = [0]
+        self.line_starts.extend(accumulate(len(line) + 1 for line in text.split('\n')[:-1]))
+
+    def line_count(self):
+        return len(self.line_starts)
+
+    def row_of(self, offset):
+        return bisect_right(self.line_starts, offset)
+
+    def position(self, offset):
+        """Returns (row, column) of the offset, column is 0-indexed"""
+        row = self.row_of(offset)
+        return row, offset - self.line_starts[row - 1]
+
+    def line_start(self, row):
+        return self.line_starts[row - 1]
+
+    def line_end(self, row):
+        """Offset of the line's '\\n' (or end of the document for the last line)"""
+        if row < len(self.line_starts):
+            return self.line_starts[row] - 1
+        return len(self.text)
+
+    def line(self, row):
+        if not 0 < row <= len(self.line_starts):
+            return ''
+        return self.text[self.line_start(row):self.line_end(row)]
+
+
+class PatternScanner:
+    """
+    Scans a text for a set of patterns at once, so callers that need several kinds of matches
+    (e.g. pattern statistics, pattern errors and text rules) share a single scan of the text.
+    """
+
+    def __init__(self, patterns: dict, start_chars=None, unfiltered_patterns=None):
+        """
+        Args:
+            patterns: Name -> regex.
+            start_chars: Characters every match starts with (if known), so texts without them aren't scanned at all.
+            unfiltered_patterns: Name -> regex, scanned in every text regardless of start_chars (e.g. user defined rules).
+        """
+        self.patterns = [(name, re.compile(pattern)) for name, pattern in patterns.items()]
+        self.unfiltered_patterns = [(name, re.compile(pattern)) for name, pattern in (unfiltered_patterns or {}).items()]
+        self.start_chars = start_chars
+
+    def scan(self, text):
+        """
+        Returns:
+            dict: Name -> list of (start, end, content) for the patterns that matched, in the order of patterns.
+            Content is the first group of the pattern (or the whole match if pattern has no groups).
+        """
+        found = {}
+        if not self.start_chars or any(char in text for char in self.start_chars):
+            self._scan_patterns(text, self.patterns, found)
+        self._scan_patterns(text, self.unfiltered_patterns, found)
+        return found
+
+    @staticmethod
+    def _scan_patterns(text, patterns, found):
+        for name, regex in patterns:
+            matches = list(regex.finditer(text))
+            if matches:
+                content_group = 1 if regex.groups else 0
+                found[name] = [(match.start(), match.end(), match.group(content_group)) for match in matches]
+
+
 def fold_text(text: str) -> str:
     # Replace multiple whitespaces with a single space and trim leading/trailing whitespaces
     folded = ' '.join(text.split())
@@ -153,26 +230,17 @@ def purify_text(text):
     return remove_placeholders(text)
 
 
-# Error fixing functions
-def fix_whitespace_before_bracket(text_list, start, end):
-    while text_list[start] != '%':
-        text_list.pop(start)
+# Error fixing functions. Each one takes the whole placeholder the error was found in (e.g. '%c [ d-green ]')
+def fix_whitespace_before_bracket(placeholder):
+    return re.sub(r'^%c\s+\[', '%c[', placeholder)
 
 
-def fix_whitespace_inside_brackets(text_list, start, end):
-    # Remove spaces after "%c["
-    while text_list[start + 3] == ' ':
-        text_list.pop(start + 3)
-    # Remove spaces before "]"
-    while text_list[end - 2] == ' ':
-        text_list.pop(end - 2)
-        end -= 1
+def fix_whitespace_inside_brackets(placeholder):
+    return re.sub(r'\[\s*(.*?)\s*\]$', r'[\1]', placeholder)
 
 
-def fix_hyphen_in_name(text_list, start, end):
-    for i in range(start, end):
-        if text_list[i] == '-':
-            text_list[i] = '_'
+def fix_hyphen_in_name(placeholder):
+    return placeholder.replace('-', '_')
 
 
 # Detect broken placeholders
@@ -181,23 +249,23 @@ EXTRA_WHITESPACE_BEFORE_BRACKET = 'Extra whitespace before "["'
 EXTRA_WHITESPACE_INSIDE_BRACKETS = 'Extra whitespace inside "[]"'
 HYPHEN_IN_NAME = 'Hyphen in the name'
 NAME_STARTS_WITH_NUMBER = 'Placeholder name starts with number'
-# Configuration block: error types, patterns, and fixing functions
+# Configuration block: error types, patterns, and fixing functions (None if error can't be fixed automatically)
 ERROR_CONFIG = {
     EXTRA_WHITESPACE_BEFORE_BRACKET: {
-        'pattern': r'(\%c\s+\[[a-z0-9_\-]+\])',
-        'fix': 'fix_whitespace_before_bracket'  # Placeholder function name
+        'pattern': r'(\%c\s+\[\s*[a-z0-9_\-]+\s*\])',
+        'fix': fix_whitespace_before_bracket
     },
     EXTRA_WHITESPACE_INSIDE_BRACKETS: {
-        'pattern': r'(\%c\[\s+[a-z0-9_\-]+\]|\%c\[[a-z0-9_\-]+\s+\])',
-        'fix': 'fix_whitespace_inside_brackets'  # Placeholder function name
+        'pattern': r'(\%c\s*\[\s+[a-z0-9_\-]+\s*\]|\%c\s*\[[a-z0-9_\-]+\s+\])',
+        'fix': fix_whitespace_inside_brackets
     },
     HYPHEN_IN_NAME: {
-        'pattern': r'(%c\[[a-z0-9_]+-(?=[a-z0-9_]*\]))',
-        'fix': 'fix_hyphen_in_name'  # Placeholder function name
+        'pattern': r'(%c\[[a-z0-9_]+-(?=[a-z0-9_\-]*\]))',
+        'fix': fix_hyphen_in_name
     },
     NAME_STARTS_WITH_NUMBER: {
         'pattern': r'(%c\[\d+[a-z0-9_\-]*\])',
-        'fix': 'fix_name_starts_with_number'  # Placeholder function name
+        'fix': None
     }
 }
 
@@ -228,53 +296,68 @@ def color_the_error(snippet, pattern, rich_style=False):
         # TODO: handle several patterns
         return result
 
+    # Raw snippet may differ from the parsed text (e.g. escaped entities)
+    return rich_guard(snippet)
+
+
+def find_text_offset(text, line_index: LineIndex, string_line=1):
+    offset = line_index.text.find(text, line_index.line_start(string_line))
+    if offset == -1:
+        # Raw text differs from parsed one (e.g. has escaped entities), so point to the string itself
+        log.debug(trn("Can't find exact position of text: %s") % text)
+        offset = line_index.line_start(string_line)
+    return offset
+
+
+def build_error(error_type, pattern, start, end, error_content, text_offset, line_index: LineIndex):
+    global_start = text_offset + start
+    global_end = text_offset + end
+
+    # Extract snippet for the same line
+    row, col = line_index.position(global_start)
+    snippet = line_index.text[line_index.line_start(row):line_index.line_end(line_index.row_of(global_end))]
+    snippet = color_the_error(snippet, pattern, True)
+
+    # Compute column
+    col += int(len(error_content) / 2)
+
+    # Enhance snippet to show a few lines before and after the error and point out the exact error position
+    prev_line = rich_guard(line_index.line(row - 1).rstrip())
+    next_line = rich_guard(line_index.line(row + 1).rstrip())
+
+    arrow_line = len(str(row)) * ' ' + ' ' * (col - 1) + '-^-'
+    enhanced_snippet = f"{row - 1}: {prev_line}\n{row}: {snippet}\n{arrow_line}\n{row + 1}: {next_line}"
+
+    # Build error object
+    error = {
+        'position': {'row': row, 'column': col},
+        'type': error_type,
+        'snippet': enhanced_snippet,
+        'content': error_content
+    }
+    log.debug(trn("Detected: %s") % error)
+    return error
+
+
+def check_placeholders(text, line_index: LineIndex, string_line=1, matches=None):
+    """
+    Args:
+        text: Text of the string to check.
+        line_index: Index of the whole document the text comes from (used to locate errors).
+        string_line: Line of the '<string>' tag, so the text is looked up only from there.
+        matches: Result of scan_placeholders() for the text, if it's already scanned.
+    """
+    if matches is None:
+        matches = scan_placeholders(text)
 
-def check_placeholders(text, xml_string):
     errors = []
+    text_offset = None
     for error_type, config in ERROR_CONFIG.items():
-        pattern = config['pattern']
-        for match in re.finditer(pattern, text):
-            start, end = match.span()
-            error_content = match.group(1)
-
-            # Compute global position in xml_string
-            global_start = xml_string.find(text) + start
-            global_end = xml_string.find(text) + end
-
-            # Extract snippet for the same line
-            line_start_global = xml_string.rfind('\n', 0, global_start) + 1
-            line_end_global = xml_string.find('\n', global_end) if xml_string.find('\n', global_end) != -1 else len(
-                xml_string)
-            snippet = xml_string[line_start_global:line_end_global]
-            snippet = color_the_error(snippet, pattern, True)
-
-            # Compute row and column
-            row = xml_string.count('\n', 0, global_start) + 1
-            col = global_start - line_start_global + int(len(error_content) / 2)
-
-            # Enhance snippet to show a few lines before and after the error and point out the exact error position
-            prev_line_start = xml_string.rfind('\n', 0, line_start_global - 1) + 1
-
-            if xml_string.find('\n', line_end_global + 1) != -1:
-                next_line_end = xml_string.find('\n', line_end_global + 1)
-            else:
-                next_line_end = len(xml_string)
-
-            prev_line = rich_guard(xml_string[prev_line_start:line_start_global].rstrip())
-            next_line = rich_guard(xml_string[line_end_global + 1:next_line_end].rstrip())
-
-            arrow_line = len(str(row)) * ' ' + ' ' * (col - 1) + '-^-'
-            enhanced_snippet = f"{row - 1}: {prev_line}\n{row}: {snippet}\n{arrow_line}\n{row + 1}: {next_line}"
-
-            # Build error object
-            error = {
-                'position': {'row': row, 'column': col},
-                'type': error_type,
-                'snippet': enhanced_snippet,
-                'content': error_content
-            }
-            errors.append(error)
-            log.debug(trn("Detected: %s") % error)
+        for start, end, error_content in matches.get(error_type, ()):
+            # Compute global position in xml_string (once per text)
+            if text_offset is None:
+                text_offset = find_text_offset(text, line_index, string_line)
+            errors.append(build_error(error_type, config['pattern'], start, end, error_content, text_offset, line_index))
     return errors
 
 
@@ -295,19 +378,198 @@ COMMON_PATERNS = {
 }
 
 
-def analyze_patterns_in_text(text):
+# User defined text rules
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+SEVERITY_INFO = 'info'
+SEVERITIES = [SEVERITY_ERROR, SEVERITY_WARNING, SEVERITY_INFO]
+
+
+class TextRule:
+    """
+    Text rule declared in the config file, e.g.:
+
+        [rule:double_spaces]
+        pattern = (?<=\\S) {2,}(?=\\S)
+        severity = warning
+        fix = " "
+        files = /ukr/
+
+    'fix' is a replacement of the match (groups may be referenced as '\\1'), the rule isn't fixable without it.
+    'files' is a regex the file path must contain, so the rule is applied to matching files only.
+    """
+
+    def __init__(self, name, pattern, severity=SEVERITY_WARNING, fix=None, files=None):
+        if name in placeholder_patterns:
+            raise ValueError(trn("Text rule '%s' clashes with built-in pattern of the same name") % name)
+        if severity not in SEVERITIES:
+            raise ValueError(trn("Text rule '%s' has unknown severity '%s' (Available: %s)") % (name, severity, SEVERITIES))
+        try:
+            self.regex = re.compile(pattern)
+            self.files_regex = re.compile(files) if files else None
+        except re.error as e:
+            raise ValueError(trn("Text rule '%s' has invalid regex: %s") % (name, e))
+
+        self.name = name
+        self.pattern = pattern
+        self.severity = severity
+        self.fix = fix
+
+    def applies_to(self, file_path):
+        return self.files_regex is None or self.files_regex.search(file_path.replace('\\', '/')) is not None
+
+
+def parse_text_rules(rules_config: dict):
+    """
+    Args:
+        rules_config: Rule name -> options of the rule (as they are in the config file).
+    """
+    rules = []
+    for name, options in rules_config.items():
+        if 'pattern' not in options:
+            raise ValueError(trn("Text rule '%s' has no pattern") % name)
+        fix = options.get('fix')
+        if fix is not None and len(fix) >= 2 and fix[0] == fix[-1] == '"':
+            # Config values are stripped, so replacements with spaces have to be quoted
+            fix = fix[1:-1]
+        rules.append(TextRule(name, options['pattern'], options.get('severity', SEVERITY_WARNING), fix,
+                              options.get('files')))
+    return rules
+
+
+_text_rules = None
+
+
+def get_text_rules():
+    global _text_rules
+    if _text_rules is None:
+        _text_rules = parse_text_rules(file_config.text_rules)
+    return _text_rules
+
+
+def get_file_text_rules(file_path):
+    return tuple(rule for rule in get_text_rules() if rule.applies_to(file_path))
+
+
+# All placeholders, their errors and text rules are found by a single scan
+placeholder_patterns = {
+    **COMMON_PATERNS,
+    **{error_type: config['pattern'] for error_type, config in ERROR_CONFIG.items()}
+}
+# Text rules -> scanner of placeholders and these rules
+_scanners = {(): PatternScanner(placeholder_patterns, start_chars='%$')}
+
+
+def get_scanner(rules=()):
+    scanner = _scanners.get(rules)
+    if scanner is None:
+        # Placeholders start with '%' or '$', but rules may match anything
+        scanner = _scanners[rules] = PatternScanner(placeholder_patterns, start_chars='%$',
+                                                    unfiltered_patterns={rule.name: rule.pattern for rule in rules})
+    return scanner
+
+
+def scan_placeholders(text, rules=()):
+    return get_scanner(rules).scan(text)
+
+
+def check_text_rules(text, line_index: LineIndex, string_line=1, matches=None, rules=()):
+    """Same as check_placeholders(), but for violations of text rules"""
+    if matches is None:
+        matches = scan_placeholders(text, rules)
+
+    errors = []
+    text_offset = None
+    for rule in rules:
+        for start, end, content in matches.get(rule.name, ()):
+            if text_offset is None:
+                text_offset = find_text_offset(text, line_index, string_line)
+            error = build_error(rule.name, rule.pattern, start, end, content, text_offset, line_index)
+            error['severity'] = rule.severity
+            errors.append(error)
+    return errors
+
+
+def analyze_patterns_in_text(text, matches=None):
+    if matches is None:
+        matches = scan_placeholders(text)
+
     report = {}
     for pattern_name in COMMON_PATERNS:
-        pattern = COMMON_PATERNS[pattern_name]
-        all_matches = re.findall(pattern, text)
-        for i, match in enumerate(all_matches):
-            all_matches[i] = rich_guard(match)
+        pattern_matches = matches.get(pattern_name)
+        if not pattern_matches:
+            continue
 
-        if all_matches:
-            log.debug(trn("Pattern matches: %s") % all_matches)
-
-        count_dict = dict(Counter(all_matches))
-        if len(count_dict) > 0:
-            report[pattern_name] = count_dict
+        counts = {}
+        for _, _, content in pattern_matches:
+            counts[content] = counts.get(content, 0) + 1
+        # Guarding is done once per unique match
+        report[pattern_name] = {rich_guard(content): count for content, count in counts.items()}
 
     return report
+
+
+MAX_FIX_PASSES = 3
+
+
+def fix_placeholders(text, matches=None, rules=()):
+    """
+    Fixes placeholder errors using spans of the matches. A fix may reveal another error of the same
+    placeholder (e.g. '%c [d-green]' -> '%c[d-green]'), so the text is rescanned until nothing changes.
+    Then fixable text rules that matched are applied.
+
+    Args:
+        text: Text of the string to fix.
+        matches: Result of scan_placeholders() for the text, if it's already scanned.
+        rules: Text rules applied to the text.
+
+    Returns:
+        tuple: Fixed text and list of (error types, placeholder before, placeholder after) of applied fixes.
+    """
+    if matches is None:
+        matches = scan_placeholders(text, rules)
+    matched_rules = [rule for rule in rules if rule.fix is not None and rule.name in matches]
+
+    applied = []
+    for _ in range(MAX_FIX_PASSES):
+        if matches is None:
+            matches = scan_placeholders(text)
+
+        # Placeholder span -> fixing functions of its errors
+        fixes = {}
+        for error_type, config in ERROR_CONFIG.items():
+            if config['fix'] is None:
+                continue
+            for start, _, _ in matches.get(error_type, ()):
+                end = text.find(']', start) + 1
+                fixes.setdefault((start, end), {})[error_type] = config['fix']
+
+        # Spans are replaced from the end, so spans before them stay valid
+        fixed_text = text
+        last_start = len(text)
+        pass_applied = []
+        for (start, end), error_fixes in sorted(fixes.items(), reverse=True):
+            if end > last_start:
+                continue
+            placeholder = fixed_placeholder = text[start:end]
+            for fix in error_fixes.values():
+                fixed_placeholder = fix(fixed_placeholder)
+            fixed_text = fixed_text[:start] + fixed_placeholder + fixed_text[end:]
+            pass_applied.append((list(error_fixes), placeholder, fixed_placeholder))
+            last_start = start
+        applied.extend(reversed(pass_applied))
+
+        if fixed_text == text:
+            break
+        text = fixed_text
+        matches = None
+
+    for rule in matched_rules:
+        def fix_match(match, rule=rule):
+            fixed = match.expand(rule.fix)
+            applied.append(([rule.name], match.group(0), fixed))
+            return fixed
+
+        text = rule.regex.sub(fix_match, text)
+
+    return text, applied
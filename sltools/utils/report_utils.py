@@ -0,0 +1,136 @@
+import gzip
+import json
+import lzma
+import os
+import struct
+
+from sltools.utils.lang_utils import trn
+
+# Layout of the compact report file:
+#   magic, compression id
+#   records: 4-byte length + compressed JSON
+#   index record (meta data, name table, offsets of all records by section and name)
+#   8-byte offset of the index record
+REPORT_MAGIC = b'SLTAP\x01'
+COMPRESSIONS = {
+    'gzip': (1, gzip.compress, gzip.decompress),
+    'lzma': (2, lzma.compress, lzma.decompress),
+}
+LENGTH_FORMAT = '>I'
+OFFSET_FORMAT = '>Q'
+
+
+def is_compact_report(file_path):
+    with open(file_path, 'rb') as file:
+        return file.read(len(REPORT_MAGIC)) == REPORT_MAGIC
+
+
+class NameTable:
+    """Interns repeated names (e.g. patterns), so records store just their indices"""
+
+    def __init__(self, names=None):
+        self.names = list(names or [])
+        self._indices = {name: i for i, name in enumerate(self.names)}
+
+    def intern(self, name):
+        index = self._indices.get(name)
+        if index is None:
+            index = self._indices[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def name(self, index):
+        return self.names[index]
+
+
+class CompactReportWriter:
+    """Report is written to a temporary file, which replaces the target one on close only"""
+
+    def __init__(self, file_path, compression='gzip', meta_data=None):
+        compression_id, self._compress, _ = COMPRESSIONS[compression]
+        self.meta_data = meta_data
+        self.file_path = file_path
+        self.tmp_path = file_path + '.tmp'
+        self.file = open(self.tmp_path, 'wb')
+        self.file.write(REPORT_MAGIC + bytes([compression_id]))
+        self.names = NameTable()
+        self.sections = {}
+
+    def _write_record(self, obj):
+        offset = self.file.tell()
+        payload = self._compress(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        self.file.write(struct.pack(LENGTH_FORMAT, len(payload)) + payload)
+        return offset
+
+    def add_record(self, section, name, obj):
+        self.sections.setdefault(section, {})[name] = self._write_record(obj)
+
+    def close(self):
+        index_offset = self._write_record({
+            "meta_data": self.meta_data,
+            "names": self.names.names,
+            "sections": self.sections
+        })
+        self.file.write(struct.pack(OFFSET_FORMAT, index_offset))
+        self.file.close()
+        os.replace(self.tmp_path, self.file_path)
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            try:
+                self.close()
+            except BaseException:
+                self.discard()
+                raise
+        else:
+            self.discard()
+
+
+class CompactReportReader:
+    """Reads only the index on open, records are loaded (and decompressed) on demand"""
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'rb')
+        header = self.file.read(len(REPORT_MAGIC) + 1)
+        if header[:len(REPORT_MAGIC)] != REPORT_MAGIC:
+            self.file.close()
+            raise ValueError(trn("File '%s' is not a compact report") % file_path)
+
+        compression_id = header[-1]
+        self._decompress = next(decompress for c_id, _, decompress in COMPRESSIONS.values() if c_id == compression_id)
+
+        offset_size = struct.calcsize(OFFSET_FORMAT)
+        self.file.seek(-offset_size, 2)
+        index = self._read_record(struct.unpack(OFFSET_FORMAT, self.file.read(offset_size))[0])
+        self.meta_data = index["meta_data"]
+        self.names = NameTable(index["names"])
+        self.sections = index["sections"]
+
+    def _read_record(self, offset):
+        self.file.seek(offset)
+        length_size = struct.calcsize(LENGTH_FORMAT)
+        length = struct.unpack(LENGTH_FORMAT, self.file.read(length_size))[0]
+        return json.loads(self._decompress(self.file.read(length)).decode('utf-8'))
+
+    def record_names(self, section):
+        return self.sections.get(section, {}).keys()
+
+    def load_record(self, section, name):
+        return self._read_record(self.sections[section][name])
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,73 @@
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+# Trigram index finds substrings of 3 characters at least
+MIN_INDEXED_SUBSTRING_LENGTH = 3
+
+
+def _required_in_sequence(parsed):
+    """
+    Returns:
+        Query tree of what any match of the sequence must contain: substring, ('and', [...]), ('or', [...])
+        or None (no requirements known).
+    """
+    items = []
+    literal_run = []
+
+    def flush():
+        if literal_run:
+            items.append(''.join(literal_run))
+            literal_run.clear()
+
+    for op, av in parsed:
+        if op == sre_constants.LITERAL:
+            literal_run.append(chr(av))
+            continue
+
+        flush()
+        if op == sre_constants.SUBPATTERN:
+            items.append(_required_in_sequence(av[-1]))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            min_count, _, item = av
+            if min_count > 0:
+                items.append(_required_in_sequence(item))
+        elif op == sre_constants.BRANCH:
+            branches = [_required_in_sequence(branch) for branch in av[1]]
+            # Branch without requirements may match anything
+            if all(branch is not None for branch in branches):
+                items.append(('or', branches))
+        # Other nodes (classes, anchors, any char, etc.) just break literal runs
+    flush()
+
+    items = [item for item in items
+             if item is not None and not (isinstance(item, str) and len(item) < MIN_INDEXED_SUBSTRING_LENGTH)]
+    return ('and', items) if items else None
+
+
+def required_substrings(pattern):
+    """
+    Builds query tree of substrings, which every match of the regex contains, e.g.
+    'Сидорович.*бар' -> ('and', ['Сидорович', 'бар']), 'Сидорович|Бармен' -> ('and', [('or', [...])]).
+    It's conservative: whatever can't be analyzed is considered to match anything.
+
+    Returns:
+        Query tree or None if nothing is required (then every text is a candidate).
+    """
+    return _required_in_sequence(sre_parse.parse(pattern))
+
+
+def _quote_fts_phrase(substring):
+    return '"%s"' % substring.replace('"', '""')
+
+
+def to_fts_query(query_tree):
+    """Converts query tree to FTS5 MATCH expression"""
+    if isinstance(query_tree, str):
+        return _quote_fts_phrase(query_tree)
+    operator, items = query_tree
+    joined = (' %s ' % operator.upper()).join(to_fts_query(item) for item in items)
+    return '(%s)' % joined if len(items) > 1 else joined
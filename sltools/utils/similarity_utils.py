@@ -0,0 +1,149 @@
+import zlib
+
+from sltools.utils.plain_text_utils import purify_text
+
+SHINGLE_SIZE = 5
+# Number of MinHash values in the signature (power of two)
+SIGNATURE_SIZE = 128
+# Shorter texts (e.g. 'Yes', 'Back') are similar to too many others to be worth reporting
+MIN_TEXT_LENGTH = 20
+# Probability that pair with similarity equal to threshold gets into the same LSH bucket
+LSH_RECALL = 0.95
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_HASH_MASK = (1 << 64) - 1
+_BIN_SHIFT = 64 - (SIGNATURE_SIZE.bit_length() - 1)
+
+
+def normalize_text(text):
+    return purify_text(text).lower()
+
+
+def shingle_hashes(normalized_text, size=SHINGLE_SIZE):
+    """Hashes of all character n-grams of the text (stable between runs, unlike hash())"""
+    # Every character takes exactly 4 bytes in UTF-32, so n-grams are just slices of the encoded text
+    data = normalized_text.encode('utf-32-le')
+    shingle_bytes = size * 4
+    if len(data) <= shingle_bytes:
+        return {zlib.crc32(data)}
+    return {zlib.crc32(data[i:i + shingle_bytes]) for i in range(0, len(data) - shingle_bytes + 4, 4)}
+
+
+def minhash_signature(hashes):
+    """
+    One permutation MinHash: every shingle is hashed once and falls into one of the signature bins
+    (by the top bits of the hash), so the signature costs O(shingles) instead of O(shingles * signature size).
+    Empty bins borrow the value of the next non-empty one (rotation), so signatures stay comparable.
+    """
+    mixed = sorted([(shingle_hash * _HASH_MULTIPLIER) & _HASH_MASK for shingle_hash in hashes], reverse=True)
+    # Values of the same bin share the top bits, so the smallest one is the last (and the one kept)
+    bins = dict(zip([value >> _BIN_SHIFT for value in mixed], mixed))
+    signature = list(map(bins.get, range(SIGNATURE_SIZE)))
+
+    if len(bins) < SIGNATURE_SIZE:
+        # Bins are walked backwards twice around, so the closest non-empty bin to the right is always known
+        next_value, distance = None, 0
+        for i in range(2 * SIGNATURE_SIZE - 1, -1, -1):
+            value = signature[i % SIGNATURE_SIZE]
+            if value is not None:
+                next_value, distance = value, 0
+            else:
+                distance += 1
+                if i < SIGNATURE_SIZE:
+                    signature[i] = next_value + distance
+    return signature
+
+
+def choose_lsh_bands(threshold):
+    """
+    Returns:
+        tuple: (bands, rows) of the most selective banding, which still puts pairs with the
+        threshold similarity into the same bucket with LSH_RECALL probability.
+    """
+    best = (SIGNATURE_SIZE, 1)
+    for rows in range(1, SIGNATURE_SIZE + 1):
+        bands = SIGNATURE_SIZE // rows
+        if 1 - (1 - threshold ** rows) ** bands >= LSH_RECALL:
+            best = (bands, rows)
+    return best
+
+
+def jaccard_similarity(set1, set2):
+    return len(set1 & set2) / len(set1 | set2)
+
+
+class _DisjointSet:
+    def __init__(self, size):
+        self.parents = list(range(size))
+
+    def find(self, i):
+        while self.parents[i] != i:
+            self.parents[i] = self.parents[self.parents[i]]
+            i = self.parents[i]
+        return i
+
+    def union(self, i, j):
+        self.parents[self.find(i)] = self.find(j)
+
+
+def find_similar_text_clusters(texts, threshold):
+    """
+    Finds clusters of similar texts in near-linear time: texts are bucketed by bands of their MinHash
+    signatures, so only texts sharing a bucket are compared (by exact Jaccard similarity of shingles).
+    Texts equal after purification are compared once.
+
+    Args:
+        texts: List of texts.
+        threshold: Minimal Jaccard similarity of shingles of similar texts (0..1).
+
+    Returns:
+        list: (lowest similarity within the cluster, indices of its texts) for each cluster, largest first.
+    """
+    # Normalized text -> indices of texts
+    unique_texts = {}
+    for i, text in enumerate(texts):
+        normalized = normalize_text(text)
+        if len(normalized) >= MIN_TEXT_LENGTH:
+            unique_texts.setdefault(normalized, []).append(i)
+    normalized_texts = list(unique_texts)
+
+    bands, rows = choose_lsh_bands(threshold)
+    buckets = {}
+    for i, normalized in enumerate(normalized_texts):
+        signature = minhash_signature(shingle_hashes(normalized))
+        for band in range(bands):
+            buckets.setdefault((band, tuple(signature[band * rows:(band + 1) * rows])), []).append(i)
+
+    shingles_cache = {}
+
+    def get_shingles(text_index):
+        shingles = shingles_cache.get(text_index)
+        if shingles is None:
+            shingles = shingles_cache[text_index] = shingle_hashes(normalized_texts[text_index])
+        return shingles
+
+    clusters = _DisjointSet(len(normalized_texts))
+    lowest_similarity = {}
+    checked_pairs = set()
+    for candidates in buckets.values():
+        for i, text1 in enumerate(candidates):
+            for text2 in candidates[i + 1:]:
+                # Same pair shares several buckets (bands) usually
+                if (text1, text2) in checked_pairs:
+                    continue
+                checked_pairs.add((text1, text2))
+                root1, root2 = clusters.find(text1), clusters.find(text2)
+                if root1 == root2:
+                    continue
+                similarity = jaccard_similarity(get_shingles(text1), get_shingles(text2))
+                if similarity >= threshold:
+                    clusters.union(root1, root2)
+                    lowest_similarity[root2] = min(similarity, lowest_similarity.pop(root1, 1.0),
+                                                   lowest_similarity.get(root2, 1.0))
+
+    grouped = {}
+    for i, normalized in enumerate(normalized_texts):
+        grouped.setdefault(clusters.find(i), []).extend(unique_texts[normalized])
+
+    result = [(lowest_similarity.get(root, 1.0), sorted(indices)) for root, indices in grouped.items() if len(indices) > 1]
+    return sorted(result, key=lambda cluster: len(cluster[1]), reverse=True)
@@ -1,4 +1,5 @@
 import os
+import queue
 import threading
 import time
 
@@ -47,3 +48,34 @@ def watch_directories(paths, q):
 def thread_watch_directories(paths):
     watch_thread = threading.Thread(target=watch_directories, args=(paths, file_changes_msg_queue))
     watch_thread.start()
+
+
+def get_changed_files_batch(q, window, max_delay):
+    """
+    Waits for changes of files and coalesces a burst of events into one batch: events are collected until
+    none comes within the window, but no longer than max delay. Repeated events of a file are deduplicated.
+
+    Returns:
+        dict: File path -> last action (in order of last events), or None if exit was requested.
+    """
+    event = q.get()
+    if event is None:
+        return None
+
+    batch = {event['file_path']: event['action']}
+    deadline = time.monotonic() + max_delay
+    while True:
+        timeout = min(window, deadline - time.monotonic())
+        if timeout <= 0:
+            break
+        try:
+            event = q.get(timeout=timeout)
+        except queue.Empty:
+            break
+        if event is None:
+            # Exit after the batch is processed
+            q.put(None)
+            break
+        batch.pop(event['file_path'], None)
+        batch[event['file_path']] = event['action']
+    return batch
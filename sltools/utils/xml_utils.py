@@ -1,21 +1,23 @@
 import codecs
-import os
+import os.path
 import re
+from collections import namedtuple
 
 from lxml import etree
-from lxml.etree import _Element
 
 from sltools.baseline.config import PRIMARY_ENCODING
 from sltools.log_config_loader import log
 from sltools.utils.colorize import cf_yellow, cf_red
 from sltools.utils.error_utils import log_and_save_error, interpret_error
+from sltools.utils.include_utils import get_include_resolver
 from sltools.utils.lang_utils import trn
 
 declaration_str = "<?xml version='1.0' encoding='WINDOWS-1251'?>"
+schema_dir = os.path.dirname(__file__) + '/../schemas'
 
 
 def remove_xml_declaration(xml_string, file_path, log_and_save_err=True):
-    doc_info = parse_doc_info(xml_string)
+    doc_info = sniff_xml_declaration(xml_string)
     pattern = re.compile(r'<\?xml.*?\?>', re.IGNORECASE)
     string_was_here = 'xml_encoding_string_was_here'
     xml_string_without_declaration = re.sub(pattern, string_was_here, xml_string)
@@ -27,6 +29,10 @@ def remove_xml_declaration(xml_string, file_path, log_and_save_err=True):
         return xml_string_without_declaration, False
 
     xml_string_without_declaration = xml_string_without_declaration.replace(string_was_here, '')
+    if doc_info is None:
+        # Declaration is present, but not in the document prolog
+        doc_info = XmlDeclaration(None, None)
+
     return xml_string_without_declaration, is_valid_doc_info(doc_info, file_path, log_and_save_err)
 
 
@@ -34,17 +40,43 @@ class EmptyXmlDocError(Exception):
     pass
 
 
-def parse_doc_info(xml_string: str):
-    parser = etree.XMLParser(recover=True)
-    tree: _Element = etree.fromstring(xml_string.encode(PRIMARY_ENCODING), parser=parser)
-    if tree is None:
+# Same attribute names as lxml's DocInfo, so both can be validated the same way
+XmlDeclaration = namedtuple('XmlDeclaration', ['xml_version', 'encoding'])
+
+# Declaration is the first thing in the document, so it's enough to look at a couple of hundred chars
+PROLOG_SNIFF_SIZE = 256
+xml_declaration_pattern = re.compile(r'<\?xml\s+version\s*=\s*([\'"])(.*?)\1(?:\s+encoding\s*=\s*([\'"])(.*?)\3)?.*?\?>',
+                                     re.IGNORECASE | re.DOTALL)
+
+
+def sniff_xml_declaration(xml_string):
+    """
+    Reads version and encoding from the XML declaration by looking only at the document prolog (without parsing).
+
+    Returns:
+        XmlDeclaration: Declared version and encoding ('UTF-8' if omitted, as the spec says),
+        or None if the document doesn't start with a declaration.
+    Raises:
+        EmptyXmlDocError: If the document has no content at all.
+    """
+    prolog = xml_string[:PROLOG_SNIFF_SIZE]
+    if isinstance(prolog, bytes):
+        prolog = prolog.decode(PRIMARY_ENCODING, errors='replace')
+
+    prolog = prolog.lstrip('\ufeff \t\r\n')
+    if len(prolog) == 0:
         raise EmptyXmlDocError()
-    return tree.getroottree().docinfo
+
+    match = xml_declaration_pattern.match(prolog)
+    if match is None:
+        return None
+
+    return XmlDeclaration(match.group(2), match.group(4) or 'UTF-8')
 
 
 def is_valid_doc_info(doc_info, file_path=None, log_and_save_err=None):
     version = doc_info.xml_version
-    encoding_lower = doc_info.encoding.lower()
+    encoding_lower = (doc_info.encoding or '').lower()
     if version != '1.0' or encoding_lower != PRIMARY_ENCODING:
         message = trn("Warning: File %s has invalid header in it") % cf_yellow(file_path)
         if log_and_save_err:
@@ -67,28 +99,120 @@ def parse_xml_root(xml_string):
     return etree.fromstring(xml_string, parser)
 
 
+def collect_xml_syntax_errors(xml_string):
+    """
+    Parses the document in recover mode, so parsing doesn't stop on the first error.
+
+    Returns:
+        list: (line, error_str) of every syntax error, where error_str is formatted as XMLSyntaxError message.
+    """
+    if isinstance(xml_string, str):
+        xml_string = xml_string.encode(PRIMARY_ENCODING)
+
+    parser = etree.XMLParser(recover=True, remove_blank_text=True)
+    etree.fromstring(xml_string, parser)
+    return [(entry.line, "%s, line %d, column %d" % (entry.message, entry.line, entry.column))
+            for entry in parser.error_log if entry.level >= etree.ErrorLevels.ERROR]
+
+
+class XmlSchemaError(Exception):
+    def __init__(self, errors):
+        super().__init__("\n".join(message for _, message in errors))
+        # List of (line, message)
+        self.errors = errors
+
+
+STRING_TABLE_TAG = 'string_table'
+_string_table_schema = None
+
+
+def get_string_table_schema():
+    global _string_table_schema
+    if _string_table_schema is None:
+        log.debug(trn("Compiling string table schema"))
+        _string_table_schema = etree.XMLSchema(etree.parse(schema_dir + '/string_table.xsd'))
+    return _string_table_schema
+
+
+# Root tag after the prolog (declaration, comments, processing instructions and doctype)
+_root_tag_pattern = re.compile(rb'(?:\s+|<\?.*?\?>|<!--.*?-->|<!DOCTYPE[^>]*>)*<([^\s/>!?]+)', re.DOTALL)
+
+
+def read_root_tag(xml_bytes):
+    """
+    Returns:
+        str: Tag of the root element, read without parsing the document. None, if it isn't found.
+    """
+    if xml_bytes.startswith(codecs.BOM_UTF8):
+        xml_bytes = xml_bytes[len(codecs.BOM_UTF8):]
+    match = _root_tag_pattern.match(xml_bytes)
+    return match.group(1).decode(PRIMARY_ENCODING) if match else None
+
+
+def parse_and_validate_xml_root(xml_string):
+    """
+    Parses the document and validates it against the string table schema in the same pass.
+    Other XML files (UI, configs, etc.) are recognized by the root tag and only checked to be well-formed.
+    Validation on parse doesn't track lines, so a string table which doesn't match the schema
+    is validated once more on its parsed tree to locate the errors. Valid documents are parsed once.
+
+    Raises:
+        XmlSchemaError: If the string table is well-formed, but doesn't match the schema.
+        XMLSyntaxError: If the document is not well-formed.
+    """
+    if isinstance(xml_string, str):
+        xml_string = xml_string.encode(PRIMARY_ENCODING)
+
+    if read_root_tag(xml_string) != STRING_TABLE_TAG:
+        return parse_xml_root(xml_string)
+
+    schema = get_string_table_schema()
+    parser = etree.XMLParser(remove_blank_text=True, schema=schema)
+    try:
+        return etree.fromstring(xml_string, parser)
+    except etree.XMLSyntaxError:
+        if any(entry.domain != etree.ErrorDomains.SCHEMASV for entry in parser.error_log):
+            raise
+
+    root = parse_xml_root(xml_string)
+    schema.validate(root)
+    raise XmlSchemaError([(entry.line, entry.message) for entry in schema.error_log])
+
+
+StringEntry = namedtuple('StringEntry', ['id', 'text', 'line'])
+
+
+def iter_strings(file_path):
+    """
+    Streams '<string>' entries of the file without building the whole tree, so memory usage
+    doesn't depend on the file size. Processed elements are freed as soon as they are yielded.
+
+    Yields:
+        StringEntry: (id, text, line), where text is None if '<string>' has no '<text>' tag
+            and line is the line of the opening '<string>' tag.
+    """
+    for _, string_elem in etree.iterparse(file_path, events=('end',), tag='string', remove_blank_text=True):
+        text_elem = string_elem.find('text')
+        text = None if text_elem is None else (text_elem.text or '')
+        yield StringEntry(string_elem.get('id'), text, string_elem.sourceline)
+
+        # Nested strings are freed along with their parent
+        parent = string_elem.getparent()
+        if parent is not None and parent.getparent() is None:
+            string_elem.clear(keep_tail=True)
+            while string_elem.getprevious() is not None:
+                del parent[0]
+
+
 def is_include_present(xml_string):
     pattern = re.compile(r'#include "(.*?\.xml)"')
     matches = pattern.findall(xml_string)
     return len(matches) != 0
 
 
-def resolve_xml_includes(xml_string):
-    trailing = "\n" if xml_string[-1] == "\n" else ""
-    lines = xml_string.splitlines()
-    processed_lines = []
-    for line in lines:
-        if line.strip().startswith('#include'):
-            # Extract the included file path
-            included_file_path = line.split('"')[1]
-            included_file_path = os.path.join("../../gamedata/configs", included_file_path.replace("\\", "/"))
-            with codecs.open(included_file_path, 'r', encoding=PRIMARY_ENCODING) as included_file:
-                included_content = included_file.read()
-                processed_lines.append(included_content)
-            # os.rename(included_file_path, included_file_path + ".include")
-        else:
-            processed_lines.append(line)
-    return '\n'.join(processed_lines) + trailing
+def resolve_xml_includes(xml_string, file_path="Not provided"):
+    resolved_xml_string, _ = get_include_resolver().resolve(xml_string, file_path)
+    return resolved_xml_string
 
 
 # Error formatters
@@ -150,17 +274,171 @@ def format_xml_string(xml_string, file_path="Not provided"):
         log_and_save_error(file_path, msg)
         raise XmlFileProcessingError(file_path + "|" + msg)
 
-    # Function to add indentation and a blank line before comments
-    indent(root)
+    return format_xml_root(root)
 
-    # Convert the XML tree to a string
-    # formatted_xml_bytes: bytes = etree.tostring(root, encoding=windows_1251)
-    formatted_xml_string = to_utf_string_with_proper_declaration(root)
 
-    # Add a blank line before comments
-    updated_xml_str = add_blank_line_before_comments(formatted_xml_string)
+def format_xml_root(root):
+    try:
+        return write_canonical_xml(root)
+    except NamespaceFoundError:
+        # Canonical writer knows nothing about namespaces, so fall back to lxml serializer
+        indent(root)
+        formatted_xml_string = to_utf_string_with_proper_declaration(root)
+        return add_blank_line_before_comments(formatted_xml_string).strip() + "\n"
+
+
+# Escaping rules of libxml2 serializer
+def escape_xml_text(text):
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    return text
+
+
+def escape_xml_attribute(value):
+    value = escape_xml_text(value)
+    if '"' in value:
+        value = value.replace('"', '&quot;')
+    if '\n' in value:
+        value = value.replace('\n', '&#10;')
+    if '\t' in value:
+        value = value.replace('\t', '&#9;')
+    return value
+
+
+indent_str = "    "
+
+
+class NamespaceFoundError(Exception):
+    pass
 
-    return updated_xml_str.strip() + "\n"
+
+def split_last_line(text, line_no):
+    """Returns text up to (and including) the last newline, the last line itself and the updated line number"""
+    newline_pos = text.rfind('\n')
+    return text[:newline_pos + 1], text[newline_pos + 1:], line_no + text.count('\n', 0, newline_pos + 1)
+
+
+def write_canonical_xml(root):
+    """
+    Serializes a parsed string table in one iterative pass. Produces exactly the same text as
+    indent() + to_utf_string_with_proper_declaration() + add_blank_line_before_comments() + strip(),
+    but without mutating the tree, re-serializing or splitting the result into lines.
+    Raises NamespaceFoundError for namespaced documents, which string tables never are.
+    """
+    parts = [declaration_str, '\n']
+    append = parts.append
+    comment_tag = etree.Comment
+    pi_tag = etree.PI
+
+    # Whitespace of the current line is held back, so a blank line can still be put in front of it
+    pending = ''
+    is_line_blank = True
+    line_no = 2
+    # Number of the latest line which starts with a comment
+    comment_line_no = 0
+
+    # Each entry is (element, level, is_last_child, is_closing)
+    stack = [(root, 0, True, False)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        elem, level, is_last, is_closing = pop()
+        tag = elem.tag
+        text = None
+        has_children = False
+        if is_closing:
+            markup = '</' + tag + '>'
+        elif tag is comment_tag:
+            markup = '<!--' + (elem.text or '') + '-->'
+            if is_line_blank:
+                if comment_line_no != line_no - 1:
+                    append('\n')
+                    line_no += 1
+                comment_line_no = line_no
+            # Comments may be multiline. Markup never ends with whitespace, so the new line isn't blank
+            line_no += markup.count('\n')
+        elif tag is pi_tag:
+            markup = etree.tostring(elem, encoding='unicode', with_tail=False)
+            line_no += markup.count('\n')
+        else:
+            if '{' in tag:
+                raise NamespaceFoundError()
+            markup = '<' + tag
+            for name, value in elem.items():
+                if '{' in name:
+                    raise NamespaceFoundError()
+                markup += ' ' + name + '="' + escape_xml_attribute(value) + '"'
+
+            text = elem.text
+            has_children = len(elem) > 0
+            if has_children:
+                push((elem, level, is_last, True))
+                children = list(elem)
+                last_index = len(children) - 1
+                for i in range(last_index, -1, -1):
+                    push((children[i], level + 1, i == last_index, False))
+            markup += '/>' if text is None and not has_children else '>'
+
+        if pending:
+            append(pending)
+            pending = ''
+        append(markup)
+        is_line_blank = False
+
+        if has_children and (not text or not text.strip()):
+            # Indentation of the first child
+            append('\n')
+            line_no += 1
+            pending = (level + 1) * indent_str
+            is_line_blank = True
+            continue
+
+        if text is not None:
+            text = escape_xml_text(text)
+            if '\n' in text:
+                text, pending, line_no = split_last_line(text, line_no)
+                append(text)
+                is_line_blank = not pending.strip()
+                if not is_line_blank:
+                    append(pending)
+                    pending = ''
+            elif text:
+                append(text)
+
+            if has_children:
+                continue
+            if pending:
+                append(pending)
+                pending = ''
+            append('</' + tag + '>')
+            is_line_blank = False
+
+        tail = elem.tail
+        if tail and tail.strip():
+            tail = escape_xml_text(tail)
+            if '\n' in tail:
+                tail, pending, line_no = split_last_line(tail, line_no)
+                append(tail)
+                is_line_blank = not pending.strip()
+                if not is_line_blank:
+                    append(pending)
+                    pending = ''
+            else:
+                append(tail)
+        elif level > 0:
+            # Root tail is left out by the serializer
+            append('\n')
+            line_no += 1
+            pending = (level - 1 if is_last else level) * indent_str
+            is_line_blank = True
+
+    return ''.join(parts).rstrip() + "\n"
 
 
 def to_utf_string_with_proper_declaration(root):
@@ -172,6 +450,10 @@ def to_utf_string_with_proper_declaration(root):
 def extract_text_from_xml(xml_string):
     root = parse_xml_root(xml_string)
     texts = [elem.text for elem in root.xpath('//text') if elem.text and elem.text.strip()]
+    return join_texts(texts)
+
+
+def join_texts(texts):
     return '.\n'.join(texts)
 
 
@@ -196,30 +478,23 @@ def fix_xml_declaration(xml_string, file_path):
     return declaration_str + no_decl
 
 
+# '&' which is not a start of a recognized character entity
+misused_ampersand_pattern = re.compile(r'&(?!(?:amp|lt|gt|quot|apos|#x[0-9a-fA-F]+|#\d+);)')
+
+
 def fix_ampersand_misuse(xml_string):
     lines = xml_string.split('\n')
-    corrected_lines = []
     for line_number, line in enumerate(lines, start=1):
-        corrected_line = ''
-        column_number = 1
-        while column_number <= len(line):
-            if line[column_number - 1] == '&':
-                # Check if it's part of a recognized character entity
-                if re.match(r'&(amp|lt|gt|quot|apos|#x[0-9a-fA-F]+|#\d+);', line[column_number - 1:]):
-                    # Skip past the character entity
-                    entity_end = line[column_number - 1:].index(';') + column_number
-                    corrected_line += line[column_number - 1:entity_end]
-                    column_number = entity_end
-                else:
-                    message = cf_yellow(trn("Misused '&' at line:%s, column:%s. Replacing & with &amp;") % (line_number, column_number))
-                    log.info(message)
-                    corrected_line += '&amp;'
-            else:
-                corrected_line += line[column_number - 1]
-            column_number += 1
-        corrected_lines.append(corrected_line)
-    corrected_xml_string = '\n'.join(corrected_lines)
-    return corrected_xml_string
+        if '&' not in line:
+            continue
+
+        def replace_ampersand(match):
+            message = cf_yellow(trn("Misused '&' at line:%s, column:%s. Replacing & with &amp;") % (line_number, match.start() + 1))
+            log.info(message)
+            return '&amp;'
+
+        lines[line_number - 1] = misused_ampersand_pattern.sub(replace_ampersand, line)
+    return '\n'.join(lines)
 
 
 def fix_possible_errors(xml_string, file_path):
@@ -228,7 +503,7 @@ def fix_possible_errors(xml_string, file_path):
     log.debug(trn("Try to detect and fix ampersand issues"))
     fixed_ampersand = fix_ampersand_misuse(fixed_comments)
     log.debug(trn("Try to detect and resolve includes"))
-    resolved_includes = resolve_xml_includes(fixed_ampersand)
+    resolved_includes = resolve_xml_includes(fixed_ampersand, file_path)
     log.debug(trn("Try to detect and fix XML declaration"))
     fixed_declaration = fix_xml_declaration(resolved_includes, file_path)
     log.debug(trn("Done with fixing"))
@@ -1,6 +1,8 @@
+import gzip
 import json
 import logging
 import os.path
+import queue
 import signal
 import subprocess
 import threading
@@ -9,15 +11,16 @@ import webbrowser
 from threading import Timer
 
 import requests
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 from flask_cors import CORS
 
-from sltools.baseline.config import file_changes_msg_queue, DefaultArgs
+from sltools.baseline.config import file_changes_msg_queue, DefaultArgs, file_changes_debounce_window, \
+    file_changes_max_delay
 from sltools.log_config_loader import log
 from sltools.root_commands.SortFilesWithDuplicates import SortFilesWithDuplicates
 from sltools.utils.lang_utils import trn
 from sltools.utils.misc import set_default
-from sltools.utils.watch_files_for_change import thread_watch_directories
+from sltools.utils.watch_files_for_change import thread_watch_directories, get_changed_files_batch
 
 app = Flask(__name__)
 
@@ -25,12 +28,28 @@ ARGS_KEY = "args"
 CALLBACK_KEY = "callback"
 LAST_REPORT_KEY = "last_report"
 LAST_REPORT_HASH_KEY = "last_report_hash"
+REPORT_BODY_CACHE_KEY = "report_body_cache"
 CTX = {
     ARGS_KEY: None,
     CALLBACK_KEY: None,
     LAST_REPORT_KEY: None,
-    LAST_REPORT_HASH_KEY: None
+    LAST_REPORT_HASH_KEY: None,
+    # (report hash, JSON body, gzipped body) of the last served full report
+    REPORT_BODY_CACHE_KEY: None
 }
+# Report and its hash are replaced and read together, so a body is never cached under the hash of other report
+report_lock = threading.Lock()
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+# Smaller responses aren't worth compressing
+MIN_GZIP_SIZE = 1024
+# Comment is sent to idle event streams, so closed connections are noticed
+SSE_KEEPALIVE_TIMEOUT = 15
+
+# Queues of messages for clients listening to report events
+report_subscribers = []
+report_subscribers_lock = threading.Lock()
 
 current_working_directory = os.getcwd()
 
@@ -74,10 +93,232 @@ def get_report_hash():
     return json.dumps(CTX[LAST_REPORT_HASH_KEY]), 200
 
 
+def get_last_report():
+    """
+    Returns:
+        tuple: (report, report hash), read together.
+    """
+    with report_lock:
+        return CTX[LAST_REPORT_KEY], CTX[LAST_REPORT_HASH_KEY]
+
+
+def get_int_arg(name, default, min_value, max_value=None):
+    value = request.args.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(trn("Parameter '%s' must be integer, got: '%s'") % (name, value))
+    if value < min_value:
+        raise ValueError(trn("Parameter '%s' must be at least %s, got: %s") % (name, min_value, value))
+    if max_value is not None and value > max_value:
+        raise ValueError(trn("Parameter '%s' must be at most %s, got: %s") % (name, max_value, value))
+    return value
+
+
+def paginate(items: list, page, page_size, report_hash):
+    # Client loading several pages restarts, if the report changed in between
+    start = (page - 1) * page_size
+    return {
+        "report_hash": report_hash,
+        "page": page,
+        "page_size": page_size,
+        "total": len(items),
+        "items": dict(items[start:start + page_size])
+    }
+
+
+def filter_overlaps(overlaps_report: dict, file_filter=None, min_overlap=1, id_prefix=None) -> list:
+    """
+    Args:
+        file_filter: Substring of either of overlapping files.
+        min_overlap: Minimal count of shared ids (after filtering by the prefix).
+        id_prefix: Only shared ids with the prefix are kept.
+
+    Returns:
+        list: (file path, overlaps data) in the order of the report.
+    """
+    filtered = []
+    for file_path, file_data in overlaps_report.items():
+        overlaps = {}
+        for other_file, overlap in file_data["overlaps"].items():
+            if file_filter and file_filter not in file_path and file_filter not in other_file:
+                continue
+            overlapping_ids = overlap['overlapping_ids']
+            if id_prefix:
+                overlapping_ids = [string_id for string_id in overlapping_ids if string_id.startswith(id_prefix)]
+            if len(overlapping_ids) < max(min_overlap, 1):
+                continue
+            overlaps[other_file] = {
+                "total_id_cnt": overlap["total_id_cnt"],
+                "match_count": len(overlapping_ids),
+                "overlapping_ids": sorted(overlapping_ids)
+            }
+        if overlaps:
+            filtered.append((file_path, {"total_id_cnt": file_data["total_id_cnt"], "overlaps": overlaps}))
+    return filtered
+
+
+def count_unique_ids(file_to_string_mapping: dict, file_paths) -> int:
+    unique_ids = set()
+    for file_path in file_paths:
+        unique_ids.update(file_to_string_mapping.get(file_path, ()))
+    return len(unique_ids)
+
+
+def make_json_response(body: bytes, etag, gzipped_body=None):
+    etag = str(etag)
+    # Weak ETag, since the same report is sent both compressed and not
+    headers = {'ETag': 'W/"%s"' % etag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+
+    if request.accept_encodings['gzip'] > 0 and len(body) >= MIN_GZIP_SIZE:
+        body = gzipped_body if gzipped_body is not None else gzip.compress(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, status=200, headers=headers, mimetype='application/json')
+
+
+def get_full_report_body():
+    """
+    Returns:
+        tuple: (report hash, JSON body, gzipped body) of the last report.
+    """
+    with report_lock:
+        report, report_hash = CTX[LAST_REPORT_KEY], CTX[LAST_REPORT_HASH_KEY]
+        cache = CTX[REPORT_BODY_CACHE_KEY]
+    if cache is not None and cache[0] == report_hash:
+        return cache
+
+    # Report is serialized once per change, not on every poll
+    body = json.dumps(report, default=set_default).encode('utf-8')
+    cache = (report_hash, body, gzip.compress(body))
+    with report_lock:
+        # Report could be replaced while serializing, then the body is still valid for this request only
+        if CTX[LAST_REPORT_HASH_KEY] == report_hash:
+            CTX[REPORT_BODY_CACHE_KEY] = cache
+    return cache
+
+
 @app.route('/report', methods=['GET'])
 def get_report():
-    json_dumps = json.dumps(CTX[LAST_REPORT_KEY], default=set_default)
-    return json_dumps, 200
+    report_hash, body, gzipped_body = get_full_report_body()
+    return make_json_response(body, report_hash, gzipped_body)
+
+
+@app.route('/report/overlaps', methods=['GET'])
+def get_report_overlaps():
+    """
+    Page of the overlaps report. Query: page, page_size, file, min_overlap, id_prefix.
+    'unique_id_cnt' is the count of unique string ids of all files with overlaps left after filtering.
+    """
+    report, report_hash = get_last_report()
+    if report is None:
+        return jsonify({"error": trn("Report isn't ready yet")}), 503
+    if request.if_none_match.contains_weak(str(report_hash)):
+        return make_json_response(b'', report_hash)
+
+    try:
+        page = get_int_arg('page', 1, 1)
+        page_size = get_int_arg('page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        min_overlap = get_int_arg('min_overlap', 1, 1)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    overlaps = filter_overlaps(report["overlaps_report"], request.args.get('file'), min_overlap,
+                               request.args.get('id_prefix'))
+    page_data = paginate(overlaps, page, page_size, report_hash)
+    page_data["unique_id_cnt"] = count_unique_ids(report["file_to_string_mapping"],
+                                                  (file_path for file_path, _ in overlaps))
+    return make_json_response(json.dumps(page_data).encode('utf-8'), report_hash)
+
+
+@app.route('/report/files', methods=['GET'])
+def get_report_files():
+    """
+    Page of files (with count of their string ids), duplicates or not. Query: page, page_size, file.
+    'unique_id_cnt' is the count of unique string ids of all files left after filtering.
+    """
+    report, report_hash = get_last_report()
+    if report is None:
+        return jsonify({"error": trn("Report isn't ready yet")}), 503
+    if request.if_none_match.contains_weak(str(report_hash)):
+        return make_json_response(b'', report_hash)
+
+    try:
+        page = get_int_arg('page', 1, 1)
+        page_size = get_int_arg('page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    file_filter = request.args.get('file')
+    mapping = report["file_to_string_mapping"]
+    files = [(file_path, len(strings)) for file_path, strings in mapping.items()
+             if not file_filter or file_filter in file_path]
+    page_data = paginate(files, page, page_size, report_hash)
+    page_data["unique_id_cnt"] = count_unique_ids(mapping, (file_path for file_path, _ in files))
+    return make_json_response(json.dumps(page_data).encode('utf-8'), report_hash)
+
+
+@app.route('/report/strings', methods=['GET'])
+def get_report_strings():
+    """Page of string ids (with hashes of texts) of the file. Query: file, page, page_size, id_prefix"""
+    report, report_hash = get_last_report()
+    if report is None:
+        return jsonify({"error": trn("Report isn't ready yet")}), 503
+    if request.if_none_match.contains_weak(str(report_hash)):
+        return make_json_response(b'', report_hash)
+
+    try:
+        page = get_int_arg('page', 1, 1)
+        page_size = get_int_arg('page_size', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    file_path = request.args.get('file')
+    strings = report["file_to_string_mapping"].get(file_path)
+    if strings is None:
+        return jsonify({"error": trn("File '%s' isn't in the report") % file_path}), 404
+
+    id_prefix = request.args.get('id_prefix', '')
+    items = [(string_id, text_hash) for string_id, text_hash in strings.items() if string_id.startswith(id_prefix)]
+    body = json.dumps(paginate(items, page, page_size, report_hash)).encode('utf-8')
+    return make_json_response(body, report_hash)
+
+
+def format_sse_message(event, data):
+    return "event: %s\ndata: %s\n\n" % (event, json.dumps(data, default=set_default))
+
+
+def notify_report_subscribers(event, data):
+    message = format_sse_message(event, data)
+    with report_subscribers_lock:
+        for subscriber in report_subscribers:
+            subscriber.put(message)
+
+
+@app.route('/report-events', methods=['GET'])
+def get_report_events():
+    """
+    Server-sent events: 'hello' with the current report hash on connect, then 'delta' on every change.
+    Client applies deltas on top of the full report with the 'previous_hash' and refetches it on a gap.
+    """
+    subscriber = queue.Queue()
+    with report_subscribers_lock:
+        report_subscribers.append(subscriber)
+
+    def stream():
+        try:
+            yield format_sse_message("hello", {"report_hash": CTX[LAST_REPORT_HASH_KEY]})
+            while True:
+                try:
+                    yield subscriber.get(timeout=SSE_KEEPALIVE_TIMEOUT)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            with report_subscribers_lock:
+                report_subscribers.remove(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 
 @app.route('/sort-duplicates-only', methods=['POST'])
@@ -120,32 +361,48 @@ def diff_files():
         return jsonify({"error": str(e)}), 500
 
 
-def calc_report_hash(report):
-    return hash(json.dumps(report, default=set_default))
+def publish_report(live_report):
+    report = live_report.report()
+    report_hash = live_report.report_hash()
+    with report_lock:
+        previous_report = CTX[LAST_REPORT_KEY]
+        previous_hash = CTX[LAST_REPORT_HASH_KEY]
+        CTX[LAST_REPORT_KEY] = report
+        CTX[LAST_REPORT_HASH_KEY] = report_hash
+
+    if previous_report is not None:
+        delta = live_report.report_delta(previous_report, report)
+        delta["previous_hash"] = previous_hash
+        delta["report_hash"] = report_hash
+        notify_report_subscribers("delta", delta)
 
 
 def worker():
-    # Initial analysis
-    _, report = CTX[CALLBACK_KEY](CTX[ARGS_KEY], True)
-    CTX[LAST_REPORT_KEY] = report
-    CTX[LAST_REPORT_HASH_KEY] = calc_report_hash(report)
+    # Initial analysis. Later only changed files are reread
+    live_report = CTX[CALLBACK_KEY](CTX[ARGS_KEY])
+    publish_report(live_report)
 
+    window = getattr(CTX[ARGS_KEY], 'debounce', None)
+    if window is None:
+        window = file_changes_debounce_window
     while True:
         log.info(trn("Watching for changes in files"))
-        event = file_changes_msg_queue.get()
-        if event is None:  # Exit condition
+        changes = get_changed_files_batch(file_changes_msg_queue, window, max(window, file_changes_max_delay))
+        if changes is None:  # Exit condition
             break
-        log.info(trn("%s has been %s") % (event['file_path'], event['action']))
-        try:
-            _, report = CTX[CALLBACK_KEY](CTX[ARGS_KEY], True)
-        except FileNotFoundError:
-            # file was removed in the middle of process. Will just retry
-            continue
-
-        if report != CTX[LAST_REPORT_KEY]:
-            log.info(trn("Files changed"))
-            CTX[LAST_REPORT_KEY] = report
-            CTX[LAST_REPORT_HASH_KEY] = calc_report_hash(report)
+        log.info(trn("Changes of %d files received") % len(changes))
+        for file_path, action in changes.items():
+            log.debug(trn("%s has been %s") % (file_path, action))
+
+        start = time.time()
+        changed = False
+        for file_path in changes:
+            if live_report.update_file(file_path):
+                changed = True
+
+        if changed:
+            publish_report(live_report)
+            log.info(trn("Files changed. Report updated in %.3fs") % (time.time() - start))
         else:
             log.info(trn("Files are the same"))
 
@@ -165,9 +422,9 @@ def check_endpoint_and_open_browser():
         time.sleep(1)  # Wait for a short time before checking again
 
 
-def run_flask_server(args, get_report_callback):
+def run_flask_server(args, live_report_callback):
     CTX[ARGS_KEY] = args
-    CTX[CALLBACK_KEY] = get_report_callback
+    CTX[CALLBACK_KEY] = live_report_callback
 
     thread_watch_directories(args.paths)
     threading.Thread(target=worker).start()
@@ -13,9 +13,81 @@ export async function sortEntriesInFiles(file1, file2) {
     return await executePostRequest("/sort-duplicates-only", {file1, file2});
 }
 
-export async function getReportData() {
-    const url = "http://127.0.0.1:5555/report";
-    return await executeGetRequest("/report");
+// Same as MAX_PAGE_SIZE of the server
+const PAGE_SIZE = 1000;
+
+/**
+ * Loads all pages of a paginated endpoint. Pages are revalidated with ETag, so unchanged ones come as 304
+ * @param {string} endpoint
+ * @param {Object} params Query parameters, empty ones are skipped
+ * @returns {Object} {items, reportHash, uniqueIdCnt} of the same version of the report
+ */
+export async function getAllPages(endpoint, params) {
+    while (true) {
+        let items = {};
+        let reportHash = undefined;
+        let uniqueIdCnt = undefined;
+        let consistent = true;
+        for (let page = 1; ; page++) {
+            const query = new URLSearchParams({page: page, page_size: PAGE_SIZE});
+            for (const [name, value] of Object.entries(params)) {
+                if (value !== undefined && value !== null && value !== "") {
+                    query.append(name, value);
+                }
+            }
+
+            const data = await executeGetRequest(endpoint + "?" + query.toString());
+            if (reportHash !== undefined && data.report_hash !== reportHash) {
+                // Report has changed in between. Start over
+                consistent = false;
+                break;
+            }
+            reportHash = data.report_hash;
+            uniqueIdCnt = data.unique_id_cnt;
+            Object.assign(items, data.items);
+            if (page * data.page_size >= data.total) {
+                break;
+            }
+        }
+
+        if (consistent) {
+            return {items, reportHash, uniqueIdCnt};
+        }
+    }
+}
+
+export async function getReportOverlaps(filters) {
+    return await getAllPages("/report/overlaps", {
+        file: filters.file,
+        min_overlap: filters.minOverlap,
+        id_prefix: filters.idPrefix
+    });
+}
+
+export async function getReportFiles(filters) {
+    return await getAllPages("/report/files", {file: filters.file});
+}
+
+// Count of unique ids of the (filtered) report, without loading it
+export async function getUniqueIdCnt(filters, withAllFiles) {
+    const query = new URLSearchParams({page_size: 1});
+    if (filters.file) {
+        query.append("file", filters.file);
+    }
+    return (await executeGetRequest((withAllFiles ? "/report/files?" : "/report/overlaps?") + query.toString()))
+        .unique_id_cnt;
+}
+
+export async function getFileStrings(file) {
+    return (await getAllPages("/report/strings", {file: file})).items;
+}
+
+export function subscribeToReportEvents(onHello, onDelta, onError) {
+    const events = new EventSource("http://127.0.0.1:5555/report-events");
+    events.addEventListener("hello", evt => onHello(JSON.parse(evt.data)));
+    events.addEventListener("delta", evt => onDelta(JSON.parse(evt.data)));
+    events.onerror = onError;
+    return events;
 }
 
 export async function executePostRequest(endpoint, params) {
@@ -1,8 +1,11 @@
 import {getFileName, prepareDivsWithIds, handleDiffButton, handleSortButton} from "./utils.js";
 import {downloadObjectAsJson} from "./misc.js";
+import {getFileStrings} from "./backendCommunication.js";
 
 
-export function displayNodeDetails(node) {
+// Strings are loaded only for details shown
+export async function displayNodeDetails(node) {
+    const fileStringIds = Object.keys(await getFileStrings(node.id));
     const detailsOverlay = document.getElementById("details");
     detailsOverlay.innerHTML = `
         <h2>Details</h2>
@@ -16,7 +19,7 @@ export function displayNodeDetails(node) {
         </div>
         <div class="status-label">ID list:</div>
         <div class="scrollable-list">
-            ${prepareDivsWithIds(node)}
+            ${prepareDivsWithIds(fileStringIds)}
         </div>
     `;
 
@@ -30,13 +33,15 @@ export function displayNodeDetails(node) {
     detailsOverlay.style.visibility = "visible";
 }
 
-export function displayLinkDetails(link, graph) {
+export async function displayLinkDetails(link) {
+    const [sourceStrings, targetStrings] = await Promise.all([getFileStrings(link.source.id),
+        getFileStrings(link.target.id)]);
     const detailsOverlay = document.getElementById("details");
     let duplicatesDivs = [];
 
     link.duplicateKeys.forEach(dup => {
-        let hash1 = graph.file_to_string_mapping[link.source.id][dup];
-        let hash2 = graph.file_to_string_mapping[link.target.id][dup];
+        let hash1 = sourceStrings[dup];
+        let hash2 = targetStrings[dup];
     
         console.log("hash1 " + hash1 + " hash2" + hash2);
         if (hash1 === hash2) {
@@ -113,7 +118,7 @@ export function displayStatistics(statistics) {
             </tr>
             <tr>
                 <td class="status-label">Total uniq string IDs:</td>
-                <td>${statistics.uniqStrings.size}</td>
+                <td>${statistics.uniqueIdCnt}</td>
                 <td id="download-unique-strings" class="downloadable has-tooltip">
                     <div class="download-icon-container">
                         <img src="/static/download.svg" class="download-icon" alt=""/>
@@ -125,8 +130,12 @@ export function displayStatistics(statistics) {
     `;
 
     // Setup downloads
-    infoOverlay.querySelector("#download-unique-strings").addEventListener("click", () => {
-        downloadObjectAsJson(Array.from(statistics.uniqStrings).sort(), "unique-strings-all-files.json");
+    infoOverlay.querySelector("#download-unique-strings").addEventListener("click", async () => {
+        const uniqStrings = new Set();
+        for (const file of statistics.files) {
+            Object.keys(await getFileStrings(file)).forEach(key => uniqStrings.add(key));
+        }
+        downloadObjectAsJson(Array.from(uniqStrings).sort(), "unique-strings-all-files.json");
     });
 }
 
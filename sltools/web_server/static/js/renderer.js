@@ -4,7 +4,7 @@ import {displayNodeDetails, displayLinkDetails, copySelfToClipboard} from "./inf
 let multiplier = 1.5
 
 
-export function renderLinks(svg, links, graph) {
+export function renderLinks(svg, links) {
     // Render links within the SVG
     const linkElements = svg.selectAll(".link")
         .data(links)
@@ -51,13 +51,13 @@ export function renderLinks(svg, links, graph) {
                     }
                 });
 
-            displayLinkDetails(d, graph);
+            displayLinkDetails(d).then();
         });
 
 }
 
 
-export function renderNodesWithLabels(svg, nodes, color, force, graph) {
+export function renderNodesWithLabels(svg, nodes, color, force) {
     // Determine the maximum total_id_cnt to scale the node size
     const maxTotalIdCount = d3.max(nodes, d => d.totalKeysCnt);
 
@@ -129,7 +129,7 @@ export function renderNodesWithLabels(svg, nodes, color, force, graph) {
                 }
             });
 
-            displayNodeDetails(d);
+            displayNodeDetails(d).then();
         });
 
     // Append text labels on top of the nodes with background rectangles
@@ -9,32 +9,75 @@
 import {downloadObjectAsJson, hashCode, hideLoadingMessage, showLoadingMessage} from "./misc.js";
 import {displayStatistics, showNotification} from "./infoProvider.js"
 import {renderLinks, renderNodesWithLabels} from "./renderer.js"
-import {getReportData, getLastReportHash} from "./backendCommunication.js";
+import {
+    getLastReportHash,
+    getReportFiles,
+    getReportOverlaps,
+    getUniqueIdCnt,
+    subscribeToReportEvents
+} from "./backendCommunication.js";
 import {handlePowerButton} from "./utils.js";
 
 let show_all_files = false;
 let lastReport = undefined;
 let lastReportHash = null;
+let reportLoading = false;
+let deltaMissed = false;
+
+// Filters applied by the server
+function getFilters() {
+    return {
+        file: document.querySelector("#filter-file").value.trim(),
+        minOverlap: document.querySelector("#filter-min-overlap").value.trim(),
+        idPrefix: document.querySelector("#filter-id-prefix").value.trim()
+    };
+}
+
+function hasFilters(filters) {
+    return Object.values(filters).some(value => value !== "");
+}
 
-// Create nodes array from graph.file_to_string_mapping
+// Loads only what is displayed: overlaps left after filtering, and other files, if they are shown
+async function loadReport() {
+    const filters = getFilters();
+    while (true) {
+        const overlaps = await getReportOverlaps(filters);
+        const report = {overlaps_report: overlaps.items, files: {}, unique_id_cnt: overlaps.uniqueIdCnt};
+        if (!show_all_files) {
+            return {report, reportHash: overlaps.reportHash};
+        }
+
+        const files = await getReportFiles(filters);
+        if (files.reportHash === overlaps.reportHash) {
+            report.files = files.items;
+            report.unique_id_cnt = files.uniqueIdCnt;
+            return {report, reportHash: files.reportHash};
+        }
+    }
+}
+
+// Create nodes array from graph.files and graph.overlaps_report
 function createNodesArray(graph) {
     const nodes = [];
     const nodeMap = {}; // Use a map to keep track of nodes
     let index = 0;
 
-    for (const file in graph.file_to_string_mapping) {
+    // File -> count of ids in it
+    const totalIdCnts = Object.assign({}, graph.files);
+    for (const file in graph.overlaps_report) {
+        totalIdCnts[file] = graph.overlaps_report[file].total_id_cnt;
+    }
+
+    for (const file in totalIdCnts) {
         const hasDuplicates = !!graph.overlaps_report[file]; // Check if the file has duplicates
         if (!show_all_files && !hasDuplicates) {
             continue;
         }
 
-
-        let strings = Object.keys(graph.file_to_string_mapping[file]);
         nodes.push({
             id: file,
-            strings: strings,
             index: index,
-            totalKeysCnt: strings.length,
+            totalKeysCnt: totalIdCnts[file],
             hasDuplicates: hasDuplicates // Set hasDuplicates based on whether the file has duplicates
         });
 
@@ -106,10 +149,10 @@ function renderGraph(graph) {
     const color = d3.scaleOrdinal(d3.schemeCategory10);
 
     // Render links within the SVG
-    renderLinks(svg, links, graph);
+    renderLinks(svg, links);
 
     // Render nodes with labels within the SVG
-    const nodesWithLabels = renderNodesWithLabels(svg, nodes, color, force, graph);
+    const nodesWithLabels = renderNodesWithLabels(svg, nodes, color, force);
 
     // Update positions on simulation "tick"
     force.on("tick", () => {
@@ -123,7 +166,7 @@ function renderGraph(graph) {
         nodesWithLabels.attr("transform", d => `translate(${d.x},${d.y})`);
     });
 
-    let stats = calculateStats(links, nodes);
+    let stats = calculateStats(links, nodes, graph.unique_id_cnt);
     displayStatistics(stats);
 }
 
@@ -162,7 +205,7 @@ function createForceSimulation(nodes, links, width, height) {
 }
 
 
-function calculateStats(links, nodes) {
+function calculateStats(links, nodes, uniqueIdCnt) {
     const numNodes = nodes.length
     // Calculate statistics
     const numDups = d3.set(links.flatMap(d => [d.source.id, d.target.id])).size();
@@ -176,15 +219,9 @@ function calculateStats(links, nodes) {
         });
     });
 
-    const uniqStrings = new Set();
-    nodes.forEach(node => {
-        node.strings.forEach(key => {
-            uniqStrings.add(key);
-        });
-    });
-
+    const files = nodes.map(node => node.id);
     const totalDuplicates = uniqueDuplicates.size;
-    return {numNoDups, numDups, numNodes, numLinks, totalDuplicates, uniqStrings};
+    return {numNoDups, numDups, numNodes, numLinks, totalDuplicates, uniqueIdCnt, files};
 }
 
 // Add an event handler to hide the "Details" overlay when clicking outside of nodes/links
@@ -211,19 +248,23 @@ document.querySelector("#show-all-files").addEventListener("change", (evt) => {
         document.querySelector("#legend-grey-files").style.opacity = "0";
     }
 
-    renderGraph(lastReport)
+    // Files without duplicates are loaded only when they are shown
+    monitorReport(true).then();
 })
 
+document.querySelectorAll(".report-filter").forEach(input => input.addEventListener("change", () => {
+    monitorReport(true).then();
+}));
 
-async function monitorReport() {
+
+async function monitorReport(force = false) {
     try {
         let newReportHash = await getLastReportHash();
-        if (newReportHash === lastReportHash) {
+        if (newReportHash === null || (newReportHash === lastReportHash && !force)) {
             console.info("Nothing changed so far");
             return;
         }
-        lastReportHash = newReportHash;
-        console.info("New report! Hash: " + lastReportHash);
+        console.info("New report! Hash: " + newReportHash);
     } catch (error) {
         console.error("Server is unavailable!");
         showNotification(`<div>Server died! No fresh data will come :(</div>`);
@@ -231,18 +272,102 @@ async function monitorReport() {
     }
     hideLoadingMessage();
 
-    let newReport = await getReportData();
+    if (reportLoading) {
+        deltaMissed = true;
+        return;
+    }
+    reportLoading = true;
+    try {
+        const {report, reportHash} = await loadReport();
+        lastReport = report;
+        lastReportHash = reportHash;
+    } finally {
+        reportLoading = false;
+    }
     console.info("New data! Let's re-render it");
     showNotification(`<div>Detected changes in files! Refreshing the graph!</div>`);
-    lastReport = newReport;
     renderGraph(lastReport);
+
+    if (deltaMissed) {
+        // Report (or filters) could change while it was downloaded
+        deltaMissed = false;
+        await monitorReport(true);
+    }
 }
 
-// Send a heartbeat every 30 seconds
-// setInterval(sendHeartbeat, 1000);
+// Apply changes pushed by the server to the report. Only unfiltered report can be patched
+function applyReportDelta(report, delta) {
+    const changedIdCnts = {};
+    for (const [file, strings] of Object.entries(delta.files.changed)) {
+        changedIdCnts[file] = Object.keys(strings).length;
+    }
+
+    for (const file of delta.files.removed) {
+        delete report.files[file];
+    }
+    if (show_all_files) {
+        Object.assign(report.files, changedIdCnts);
+    }
+
+    const overlapsReport = report.overlaps_report;
+    for (const [file1, file2] of delta.overlaps.removed) {
+        if (!overlapsReport[file1]) {
+            continue;
+        }
+        delete overlapsReport[file1].overlaps[file2];
+        // Report has only files with duplicates
+        if (Object.keys(overlapsReport[file1].overlaps).length === 0) {
+            delete overlapsReport[file1];
+        }
+    }
+    for (const [file1, file2, overlap] of delta.overlaps.added.concat(delta.overlaps.changed)) {
+        if (!overlapsReport[file1]) {
+            overlapsReport[file1] = {total_id_cnt: 0, overlaps: {}};
+        }
+        overlapsReport[file1].overlaps[file2] = overlap;
+    }
+
+    for (const file in overlapsReport) {
+        if (file in changedIdCnts) {
+            overlapsReport[file].total_id_cnt = changedIdCnts[file];
+        } else if (overlapsReport[file].total_id_cnt === 0) {
+            // Unchanged file got its first overlap. Overlaps of other files have its count
+            const otherFile = Object.keys(overlapsReport[file].overlaps)[0];
+            const otherOverlap = overlapsReport[otherFile] && overlapsReport[otherFile].overlaps[file];
+            overlapsReport[file].total_id_cnt = otherOverlap ? otherOverlap.total_id_cnt : 0;
+        }
+    }
+}
+
+async function handleReportDelta(delta) {
+    if (reportLoading) {
+        deltaMissed = true;
+        return;
+    }
+    const filters = getFilters();
+    if (lastReport === undefined || delta.previous_hash !== lastReportHash || hasFilters(filters)) {
+        // Some changes were missed, or the report is filtered by the server. Start over from the report
+        monitorReport().then();
+        return;
+    }
+
+    applyReportDelta(lastReport, delta);
+    lastReportHash = delta.report_hash;
+    console.info("New delta! Hash: " + lastReportHash);
+    lastReport.unique_id_cnt = await getUniqueIdCnt(filters, show_all_files);
+    showNotification(`<div>Detected changes in files! Refreshing the graph!</div>`);
+    renderGraph(lastReport);
+}
 
 // ---------------------- INITIALIZE GRAPH ----------------------
 showLoadingMessage();
-monitorReport().then();
-setInterval(monitorReport, 1000);
+// Server pushes changes, so the report is downloaded only on (re)connect
+subscribeToReportEvents(
+    () => monitorReport().then(),
+    delta => handleReportDelta(delta).then(),
+    () => {
+        console.error("Server is unavailable!");
+        showNotification(`<div>Lost connection to the server. Reconnecting...</div>`);
+    }
+);
 document.querySelector(".shutdown-img").addEventListener("click", handlePowerButton);
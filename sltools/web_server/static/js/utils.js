@@ -6,8 +6,7 @@ export function getFileName(filePath) {
     return parts[parts.length - 1];
 }
 
-export function prepareDivsWithIds(node) {
-    const fileStringIds = node.strings;
+export function prepareDivsWithIds(fileStringIds) {
     if (fileStringIds && fileStringIds.length > 0) {
         return `<div class="path">${fileStringIds.join("</div><div class='path''>")}</div>`;
     } else {
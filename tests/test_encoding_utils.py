@@ -0,0 +1,64 @@
+from sltools.baseline.config import PRIMARY_ENCODING
+from sltools.utils.encoding_utils import classify_encoding_segments, classify_line_encoding, is_mixed_encoding, \
+    normalize_segments_to_primary_encoding, ASCII_ENCODING, UTF8_ENCODING, AMBIGUOUS_ENCODING
+
+HEADER = ['<?xml version="1.0" encoding="windows-1251"?>', '<string_table>']
+FOOTER = ['</string_table>']
+# windows-1251 texts, which are valid UTF-8 too
+SHORT_TEXTS = ['Ні', 'Ві', 'Сі', 'Рі']
+
+
+def string_lines(texts):
+    return ['<string id="id_%d"><text>%s</text></string>' % (i, text) for i, text in enumerate(texts)]
+
+
+def encode_lines(lines, encoding):
+    return '\n'.join(lines).encode(encoding)
+
+
+def test_short_cp1251_lines_are_not_utf8():
+    for text in SHORT_TEXTS:
+        line = ('<text>%s</text>' % text).encode(PRIMARY_ENCODING)
+        assert classify_line_encoding(line) in (PRIMARY_ENCODING, AMBIGUOUS_ENCODING), text
+
+
+def test_utf8_lines_with_evidence():
+    assert classify_line_encoding('<text>Привіт</text>'.encode('utf-8')) == UTF8_ENCODING
+    assert classify_line_encoding(b'<text>abc</text>') == ASCII_ENCODING
+
+
+def test_cp1251_file_with_short_lines_is_not_mixed():
+    lines = HEADER + string_lines(['Сірий вовк'] + SHORT_TEXTS) + FOOTER
+    binary_text = encode_lines(lines, PRIMARY_ENCODING)
+
+    segments = classify_encoding_segments(binary_text)
+
+    assert segments == [(PRIMARY_ENCODING, 1, len(lines))]
+    assert not is_mixed_encoding(segments)
+    assert normalize_segments_to_primary_encoding(binary_text, segments) == binary_text
+
+
+def test_cp1251_file_with_short_lines_only_is_cp1251():
+    lines = HEADER + string_lines(SHORT_TEXTS) + FOOTER
+
+    assert classify_encoding_segments(encode_lines(lines, PRIMARY_ENCODING)) == [(PRIMARY_ENCODING, 1, len(lines))]
+
+
+def test_utf8_file_with_short_lines_is_utf8():
+    lines = HEADER + string_lines(['Сірий вовк', 'Да']) + FOOTER
+
+    assert classify_encoding_segments(encode_lines(lines, 'utf-8')) == [(UTF8_ENCODING, 1, len(lines))]
+
+
+def test_mixed_file_is_normalized():
+    cp1251_lines = HEADER + string_lines(['Сірий вовк', 'Рі'])
+    utf8_lines = string_lines(['Привіт світ']) + FOOTER
+    binary_text = encode_lines(cp1251_lines, PRIMARY_ENCODING) + b'\n' + encode_lines(utf8_lines, 'utf-8')
+
+    segments = classify_encoding_segments(binary_text)
+
+    assert is_mixed_encoding(segments)
+    assert segments == [(PRIMARY_ENCODING, 1, len(cp1251_lines)),
+                        (UTF8_ENCODING, len(cp1251_lines) + 1, len(cp1251_lines) + len(utf8_lines))]
+    assert (normalize_segments_to_primary_encoding(binary_text, segments)
+            == encode_lines(cp1251_lines + utf8_lines, PRIMARY_ENCODING))
@@ -0,0 +1,39 @@
+from sltools.root_commands.FindStringDuplicates import FindStringDuplicates, read_file_string_hashes
+from sltools.utils.occurrence_utils import StringOccurrences
+
+FILE_WITH_STRING_WITHOUT_ID = '''<?xml version="1.0" encoding="windows-1251"?>
+<string_table>
+    <string id="first">
+        <text>First</text>
+    </string>
+    <string>
+        <text>No id</text>
+    </string>
+    <string id="second">
+        <text>Second</text>
+    </string>
+</string_table>
+'''
+
+
+def write_xml(tmp_path, name, content):
+    file_path = tmp_path / name
+    file_path.write_bytes(content.encode('windows-1251'))
+    return str(file_path)
+
+
+def test_string_without_id_in_the_middle_is_skipped(tmp_path):
+    file_path = write_xml(tmp_path, 'strings.xml', FILE_WITH_STRING_WITHOUT_ID)
+    occurrences = StringOccurrences()
+
+    FindStringDuplicates()._process_file(file_path, occurrences, None)
+
+    file_ids = [occurrence.string_id for occurrence in occurrences.file_occurrences(0)]
+    assert file_ids == ['first', 'second']
+    assert occurrences.file_occurrences(0)[1].line == 9
+
+
+def test_live_report_skips_string_without_id(tmp_path):
+    file_path = write_xml(tmp_path, 'strings.xml', FILE_WITH_STRING_WITHOUT_ID)
+
+    assert list(read_file_string_hashes(file_path)) == ['first', 'second']